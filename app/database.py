@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 import os
 import sys
 from pymongo.errors import ConfigurationError
+from app.utils.indexes import ensure_indexes
 import logging
 
 load_dotenv()
@@ -16,6 +17,8 @@ class DatabaseManager:
     def __init__(self):
         self.client = None
         self.db = None
+        self.indexes_ensured = False
+        self.transactions_supported = None
     
     @classmethod
     async def get_instance(cls):
@@ -46,6 +49,13 @@ class DatabaseManager:
             logging.error(f"❌ MongoDB connection error: {e}")
             sys.exit(1)
     
+    async def supports_transactions(self):
+        # Transações multi-documento exigem replica set (ou mongos)
+        if self.transactions_supported is None:
+            hello = await self.client.admin.command("hello")
+            self.transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        return self.transactions_supported
+    
     async def get_users_collection(self):
         return self.db.users
     
@@ -54,10 +64,44 @@ class DatabaseManager:
     
     async def get_notes_collection(self):
         return self.db.notes
+    
+    async def get_user_stats_collection(self):
+        return self.db.user_stats
+    
+    async def get_category_rules_collection(self):
+        return self.db.category_rules
+    
+    async def get_project_transactions_collection(self):
+        return self.db.project_transactions
+    
+    async def get_revoked_tokens_collection(self):
+        return self.db.revoked_tokens
+    
+    async def get_rate_limits_collection(self):
+        return self.db.rate_limits
+    
+    async def get_email_outbox_collection(self):
+        return self.db.email_outbox
+    
+    async def get_password_reset_codes_collection(self):
+        return self.db.password_reset_codes
+    
+    async def get_sync_tombstones_collection(self):
+        return self.db.sync_tombstones
+    
+    async def get_idempotency_keys_collection(self):
+        return self.db.idempotency_keys
+    
+    async def get_app_settings_collection(self):
+        return self.db.app_settings
 
-# Initialize database connection
+# Initialize database connection (and make sure the registered indexes exist)
 async def init_db():
-    return await DatabaseManager.get_instance()
+    db_manager = await DatabaseManager.get_instance()
+    if not db_manager.indexes_ensured:
+        db_manager.indexes_ensured = True
+        await ensure_indexes(db_manager.db)
+    return db_manager
 
 # Helper functions to get collections
 async def get_users_collection():
@@ -70,4 +114,44 @@ async def get_projects_collection():
 
 async def get_notes_collection():
     db_manager = await DatabaseManager.get_instance()
-    return await db_manager.get_notes_collection()
\ No newline at end of file
+    return await db_manager.get_notes_collection()
+
+async def get_user_stats_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_user_stats_collection()
+
+async def get_category_rules_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_category_rules_collection()
+
+async def get_project_transactions_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_project_transactions_collection()
+
+async def get_revoked_tokens_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_revoked_tokens_collection()
+
+async def get_rate_limits_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_rate_limits_collection()
+
+async def get_email_outbox_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_email_outbox_collection()
+
+async def get_password_reset_codes_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_password_reset_codes_collection()
+
+async def get_sync_tombstones_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_sync_tombstones_collection()
+
+async def get_idempotency_keys_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_idempotency_keys_collection()
+
+async def get_app_settings_collection():
+    db_manager = await DatabaseManager.get_instance()
+    return await db_manager.get_app_settings_collection()
\ No newline at end of file
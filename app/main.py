@@ -1,8 +1,12 @@
+import asyncio
 import logging
 from datetime import datetime
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import init_db
+from app.utils import idempotency, loaders, outbox, rate_limit, revocation, user_cache
+from app.utils.email_service import smtp_stats
+from app.utils.security import password_hash_stats, pin_bcrypt_rounds
 import os
 
 # Configuração do logger
@@ -47,6 +51,13 @@ app.add_middleware(
 async def startup_event() -> None:
     try:
         await init_db()
+        # Custo do bcrypt da implantação (ver app/utils/security.py)
+        await pin_bcrypt_rounds()
+        # Revogações de token: carga inicial + sync periódico em background
+        await revocation.sync()
+        app.state.revocation_sync = asyncio.create_task(revocation.sync_loop())
+        # Despachante do email_outbox
+        app.state.outbox_dispatcher = asyncio.create_task(outbox.dispatch_loop())
         logger.info(f"✅ Database initialized successfully in {ENVIRONMENT} environment")
         db_url = os.getenv("DATABASE_URL", "local database")
         logger.info(f"🔗 Database connection: {db_url[:15]}...")
@@ -54,6 +65,19 @@ async def startup_event() -> None:
         logger.error(f"❌ Startup error: {e}", exc_info=True)
         raise
 
+# Encerra as tarefas de background iniciadas no startup
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    tasks = [
+        task for task in (
+            getattr(app.state, "revocation_sync", None),
+            getattr(app.state, "outbox_dispatcher", None),
+        ) if task is not None
+    ]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
 # Importação das rotas (mantido após startup para evitar import circular)
 from app.routes import (
     project,
@@ -62,6 +86,9 @@ from app.routes import (
     user_register,
     stats,
     password_reset,   # ← recuperação de senha
+    category_rules,
+    sync,             # ← sincronização incremental do app
+    batch,            # ← fila offline (mutações em lote)
 )
 
 # Prefixo de rota
@@ -72,6 +99,10 @@ app.include_router(user_register.router, prefix=API_PREFIX, tags=["Users"])
 app.include_router(project.router,       prefix=API_PREFIX, tags=["Projects"])
 app.include_router(note.router,          prefix=API_PREFIX, tags=["Notes"])
 app.include_router(stats.router,         prefix=API_PREFIX, tags=["Statistics"])  # ← NOVO
+app.include_router(category_rules.router, prefix=API_PREFIX, tags=["Categories"])
+app.include_router(password_reset.router, prefix=API_PREFIX, tags=["Password Reset"])
+app.include_router(sync.router,           prefix=API_PREFIX, tags=["Sync"])
+app.include_router(batch.router,          prefix=API_PREFIX, tags=["Batch"])
 
 # Rota raiz
 @app.get("/", tags=["Root"])
@@ -104,6 +135,21 @@ async def health_check() -> dict:
             "timestamp": datetime.utcnow().isoformat()
         }
 
+# Métricas internas (caches em processo)
+@app.get("/metrics", tags=["Health Check"])
+async def metrics() -> dict:
+    return {
+        "user_cache": user_cache.stats(),
+        "loaders":    loaders.stats(),
+        "password_hashing": password_hash_stats(),
+        "revoked_tokens":   revocation.stats(),
+        "admission":        rate_limit.stats(),
+        "smtp":             smtp_stats(),
+        "email_outbox":     outbox.stats(),
+        "idempotency":      idempotency.stats(),
+        "timestamp":  datetime.utcnow().isoformat(),
+    }
+
 # Configuração para o Render
 if __name__ == "__main__":
     import uvicorn
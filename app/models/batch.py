@@ -0,0 +1,38 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+# Uma mutação da fila offline do app. data segue o corpo da rota equivalente:
+#   note/create     NoteCreate      (project_id opcional, como em POST /notes/)
+#   note/update     NoteUpdate      id obrigatório
+#   project/create  ProjectCreate
+#   project/update  ProjectUpdate   id obrigatório
+#   */delete        —               id obrigatório
+class BatchOperation(BaseModel):
+    idempotency_key: str = Field(..., min_length=1, max_length=128)
+    entity: str = Field(..., regex="^(note|project)$")
+    action: str = Field(..., regex="^(create|update|delete)$")
+    id: Optional[str] = None
+    project_id: Optional[str] = None
+    data: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+
+# Resultado por operação, na ordem do pedido. status espelha o da rota
+# equivalente (201, 200, 204, 404, 422...); data traz a nota/projeto
+# resultante. replayed=true: chave já vista, resultado da primeira execução
+class BatchOperationResult(BaseModel):
+    index: int
+    idempotency_key: str
+    status: int
+    id: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    replayed: bool = False
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
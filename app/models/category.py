@@ -0,0 +1,20 @@
+from typing import Dict, List
+from pydantic import BaseModel
+
+
+# Regra de categoria definida pelo usuário
+# Palavras-chave são comparadas sem acento e sem diferenciar maiúsculas
+class CategoryRule(BaseModel):
+    category: str
+    keywords: List[str]
+
+
+class CategoryRulesUpdate(BaseModel):
+    rules: List[CategoryRule]
+
+
+# Resposta de GET/PUT /categories/rules
+# rules têm prioridade sobre defaults, na ordem em que foram enviadas
+class CategoryRules(BaseModel):
+    rules: List[CategoryRule]
+    defaults: Dict[str, List[str]]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel
 
 
@@ -25,6 +25,12 @@ class NoteDB(NoteBase):
     updated_at: datetime
 
 
+# Página de GET /notes/?limit=...  (cursor opaco para a próxima página)
+class NotePage(BaseModel):
+    items: List[NoteDB]
+    next_cursor: Optional[str] = None
+
+
 # Modelo para atualização parcial (todos os campos opcionais)
 class NoteUpdate(BaseModel):
     title: Optional[str] = None
@@ -26,7 +26,14 @@ class ProjectDB(ProjectBase):
     created_at: datetime
     updated_at: datetime
     progress: float = 0.0
-    transactions: List[dict] = []    # ← NOVO: lista de aportes
+    transactions: List[dict] = []    # ← NOVO: lista de aportes (últimos N por padrão)
+    transactions_count: int = 0      # total de aportes, mesmo quando a lista vem cortada
+
+
+# Página de GET /projects/?limit=...  (cursor opaco para a próxima página)
+class ProjectPage(BaseModel):
+    items: List[ProjectDB]
+    next_cursor: Optional[str] = None
 
 
 class ProjectUpdate(BaseModel):
@@ -51,6 +58,30 @@ class DepositResponse(BaseModel):
     required_value: float
 
 
+# POST /projects/deposits/batch — vários aportes em uma requisição
+class BatchDepositItem(BaseModel):
+    project_id: str
+    amount: float
+    note: str = ""
+
+
+class BatchDepositRequest(BaseModel):
+    deposits: List[BatchDepositItem]
+    ordered: bool = True    # True: para no primeiro erro de escrita
+
+
+# Resultado por item, na mesma ordem do pedido: result OU error
+class BatchDepositResult(BaseModel):
+    index: int
+    project_id: str
+    result: Optional[DepositResponse] = None
+    error: Optional[str] = None
+
+
+class BatchDepositResponse(BaseModel):
+    results: List[BatchDepositResult]
+
+
 # Transação individual — GET /projects/{id}/transactions
 # Mapeado com Transacao.fromJson() no Flutter
 class TransactionDB(BaseModel):
@@ -59,4 +90,10 @@ class TransactionDB(BaseModel):
     user_id: str
     amount: float
     note: Optional[str] = ""
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+
+# Página de GET /projects/{id}/transactions?limit=...
+class TransactionPage(BaseModel):
+    items: List[TransactionDB]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,23 @@
+from typing import List
+from pydantic import BaseModel
+
+from app.models.note import NoteDB
+from app.models.project import ProjectDB, TransactionDB
+
+
+# Ids removidos desde o último token (ver app/utils/sync.py)
+class SyncDeleted(BaseModel):
+    projects: List[str] = []
+    notes: List[str] = []
+
+
+# Resposta de GET /sync: o cliente aplica as mudanças por id, depois as
+# exclusões, e guarda sync_token para a próxima chamada.
+# full=true: estado completo, substitui o que o app tem localmente
+class SyncResponse(BaseModel):
+    projects: List[ProjectDB] = []
+    notes: List[NoteDB] = []
+    transactions: List[TransactionDB] = []
+    deleted: SyncDeleted = SyncDeleted()
+    sync_token: str
+    full: bool = False
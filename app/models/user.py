@@ -74,4 +74,16 @@ class TokenUser(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
-    user: TokenUser
\ No newline at end of file
+    user: TokenUser
+    refresh_token: Optional[str] = None
+
+
+# POST /auth/refresh e /auth/logout
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class RefreshResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
\ No newline at end of file
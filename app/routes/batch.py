@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.models.batch import BatchRequest, BatchResponse
+from app.models.user import UserDB
+from app.utils.mutations import apply_batch
+from app.utils.security import get_current_user
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+MAX_BATCH_OPERATIONS = 100
+
+
+# ── POST /batch ────────────────────────────────────────────────────────── NOVO
+# Fila offline do Flutter: criações, edições e exclusões de notas e projetos
+# numa chamada só, cada uma com sua idempotency_key. Um bulk_write por
+# coleção; resultado por operação, na ordem do pedido (ver utils/mutations.py)
+@router.post("/", response_model=BatchResponse)
+async def batch(
+    body: BatchRequest,
+    current_user: UserDB = Depends(get_current_user),
+):
+    if not body.operations:
+        raise HTTPException(status_code=400, detail="Nenhuma operação informada")
+    if len(body.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {MAX_BATCH_OPERATIONS} operações por requisição"
+        )
+    keys = [op.idempotency_key for op in body.operations]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="idempotency_key repetida no lote")
+
+    results = await apply_batch(current_user.id, body.operations)
+    return BatchResponse(results=results)
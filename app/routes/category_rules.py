@@ -0,0 +1,61 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from app.models.category import CategoryRules, CategoryRulesUpdate
+from app.models.user import UserDB
+from app.utils.classifier import DEFAULT_RULES, get_user_rules, save_user_rules
+from app.utils.note_parser import backfill
+from app.utils.security import get_current_user
+from app.utils.user_stats import rebuild
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/categories",
+    tags=["Categories"],
+    responses={422: {"description": "Validation error"}},
+)
+
+
+async def _recategorize(user_id: str) -> None:
+    """Reclassifica as notas do usuário com as regras novas e refaz user_stats."""
+    try:
+        updated = await backfill(recompute=True, user_id=user_id)
+        await rebuild(user_id)
+        logger.info(f"Regras de categoria de {user_id}: {updated} nota(s) reclassificada(s)")
+    except Exception as e:
+        logger.error(f"Erro ao reclassificar notas de {user_id}: {e}")
+
+
+# ── GET /categories/rules ─────────────────────────────────────────────────────
+@router.get("/rules", response_model=CategoryRules)
+async def get_rules(current_user: UserDB = Depends(get_current_user)):
+    return CategoryRules(
+        rules=await get_user_rules(current_user.id),
+        defaults=DEFAULT_RULES,
+    )
+
+
+# ── PUT /categories/rules ─────────────────────────────────────────────────────
+# Substitui o conjunto de regras do usuário; as notas existentes são
+# reclassificadas em segundo plano
+@router.put("/rules", response_model=CategoryRules)
+async def update_rules(
+    body: CategoryRulesUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: UserDB = Depends(get_current_user),
+):
+    rules = []
+    for rule in body.rules:
+        category = rule.category.strip()
+        keywords = [k.strip() for k in rule.keywords if k.strip()]
+        if not category or not keywords:
+            raise HTTPException(
+                status_code=400,
+                detail="Cada regra precisa de uma categoria e ao menos uma palavra-chave"
+            )
+        rules.append({"category": category, "keywords": keywords})
+
+    await save_user_rules(current_user.id, rules)
+    background_tasks.add_task(_recategorize, current_user.id)
+
+    return CategoryRules(rules=rules, defaults=DEFAULT_RULES)
\ No newline at end of file
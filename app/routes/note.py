@@ -1,13 +1,22 @@
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import Response
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.database import get_notes_collection
-from app.models.note import NoteCreate, NoteDB, NoteUpdate
+from app.models.note import NoteCreate, NoteDB, NotePage, NoteUpdate
 from app.models.user import UserDB
+from app.utils import etag, loaders
+from app.utils.classifier import get_classifier
+from app.utils.fast_json import FastJSONResponse, to_public
+from app.utils.note_parser import extract_note_fields
+from app.utils.pagination import MAX_PAGE_SIZE, fetch_page, is_paginated
 from app.utils.security import get_current_user
+from app.utils.streaming import STREAM_BATCH_SIZE, batched, stream_list
+from app.utils.sync import record_deletion
+from app.utils.user_stats import record_note
 
 router = APIRouter(
     prefix="/notes",
@@ -35,29 +44,56 @@ async def create_note(
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     })
+    # Valores em R$ e categoria extraídos uma vez só, aqui na escrita
+    classifier = await get_classifier(current_user.id)
+    note_dict.update(extract_note_fields(note.title, note.content, classifier))
 
     result = await notes_collection.insert_one(note_dict)
     note_dict["id"] = str(result.inserted_id)
 
+    await record_note(current_user.id, None, note_dict)
+
     return NoteDB(**note_dict)
 
 
 # ── GET /notes/ ───────────────────────────────────────────────────────────────
-@router.get("/", response_model=List[NoteDB])
+# Sem limit/cursor devolve a lista completa (formato esperado pelo Flutter);
+# com eles, uma página {items, next_cursor} ordenada por (created_at, _id)
+# If-None-Match com o ETag atual → 304 sem tocar na coleção (ver utils/etag.py)
+@router.get("/", response_model=Union[List[NoteDB], NotePage])
 async def list_notes(
+    request: Request,
     project_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("asc", regex="^(asc|desc)$"),
     current_user: UserDB = Depends(get_current_user)
 ):
+    tag, not_modified = await etag.check(request, current_user.id)
+    if not_modified:
+        return not_modified
+
     notes_collection = await get_notes_collection()
     query = {"user_id": current_user.id}
     if project_id:
         query["project_id"] = project_id
 
-    notes: List[NoteDB] = []
-    async for note in notes_collection.find(query):
-        note["id"] = str(note["_id"])
-        notes.append(NoteDB(**note))
-    return notes
+    if is_paginated(limit, cursor):
+        docs, next_cursor = await fetch_page(notes_collection, query, limit, cursor, order)
+        for note in docs:
+            note["id"] = str(note["_id"])
+        return etag.tag(FastJSONResponse({
+            "items": [to_public(n, NoteDB) for n in docs], "next_cursor": next_cursor,
+        }), tag)
+
+    # Lista completa: em streaming, lote a lote direto do cursor
+    async def batches():
+        async for docs in batched(notes_collection.find(query).batch_size(STREAM_BATCH_SIZE)):
+            for note in docs:
+                note["id"] = str(note["_id"])
+            yield [to_public(n, NoteDB) for n in docs]
+
+    return etag.tag(stream_list(request, batches()), tag)
 
 
 # ── GET /notes/{note_id} ──────────────────────────────────────────────────────
@@ -66,16 +102,11 @@ async def get_note(
     note_id: str,
     current_user: UserDB = Depends(get_current_user)
 ):
-    notes_collection = await get_notes_collection()
-    note = await notes_collection.find_one({
-        "_id": ObjectId(note_id),
-        "user_id": current_user.id
-    })
-    if not note:
+    note = await loaders.notes.load(ObjectId(note_id))
+    if not note or note.get("user_id") != current_user.id:
         raise HTTPException(status_code=404, detail="Nota não encontrada")
 
-    note["id"] = str(note["_id"])
-    return NoteDB(**note)
+    return FastJSONResponse(to_public(note, NoteDB))
 
 
 # ── PUT /notes/{note_id} ──────────────────────────────────────────────────────
@@ -90,15 +121,36 @@ async def update_note(
     update_data = note_update.dict(exclude_unset=True)
     update_data["updated_at"] = datetime.utcnow()
 
-    result = await notes_collection.update_one(
+    # Texto alterado: reextrai valores a partir do título/conteúdo resultantes
+    if "title" in update_data or "content" in update_data:
+        if "title" in update_data and "content" in update_data:
+            current = update_data
+        else:
+            current = await notes_collection.find_one(
+                {"_id": ObjectId(note_id), "user_id": current_user.id},
+                {"title": 1, "content": 1},
+            )
+            if not current:
+                raise HTTPException(status_code=404, detail="Nota não encontrada")
+        update_data.update(extract_note_fields(
+            update_data.get("title",   current.get("title")),
+            update_data.get("content", current.get("content")),
+            await get_classifier(current_user.id),
+        ))
+
+    # Devolve a versão anterior para o cálculo incremental de user_stats
+    previous_note = await notes_collection.find_one_and_update(
         {"_id": ObjectId(note_id), "user_id": current_user.id},
-        {"$set": update_data}
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE,
     )
 
-    if result.matched_count == 0:
+    if previous_note is None:
         raise HTTPException(status_code=404, detail="Nota não encontrada")
 
-    updated_note = await notes_collection.find_one({"_id": ObjectId(note_id)})
+    updated_note = {**previous_note, **update_data}
+    await record_note(current_user.id, previous_note, updated_note)
+
     updated_note["id"] = str(updated_note["_id"])
     return NoteDB(**updated_note)
 
@@ -111,7 +163,7 @@ async def delete_note(
 ):
     notes_collection = await get_notes_collection()
 
-    note = await notes_collection.find_one({
+    note = await notes_collection.find_one_and_delete({
         "_id": ObjectId(note_id),
         "user_id": current_user.id
     })
@@ -119,5 +171,6 @@ async def delete_note(
     if not note:
         raise HTTPException(status_code=404, detail="Nota não encontrada")
 
-    await notes_collection.delete_one({"_id": ObjectId(note_id)})
+    await record_note(current_user.id, note, None)
+    await record_deletion(current_user.id, "note", [note_id])
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
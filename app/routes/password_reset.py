@@ -8,8 +8,9 @@ Fluxo:
 
 Segurança:
   - Código de 6 dígitos gerado com secrets.randbelow (não random)
-  - Expiração de 15 minutos salva no MongoDB
-  - Tentativas erradas incrementadas (máx 5 — bloqueia por segurança)
+  - Expiração de 15 minutos (coleção password_reset_codes, índice TTL)
+  - Tentativas erradas incrementadas (máx 5 — bloqueia por segurança), na
+    mesma operação atômica que valida o código
   - Hash do código salvo no banco (nunca o código em claro)
 """
 
@@ -18,12 +19,16 @@ import hashlib
 import logging
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from pydantic import BaseModel, EmailStr
 
-from app.database import get_users_collection
-from app.utils.email_service import send_email, build_reset_email
-from app.utils.security import get_password_hash
+from app.database import get_password_reset_codes_collection, get_users_collection
+from app.utils import outbox, user_cache
+from app.utils.rate_limit import password_route
+from app.utils.email_service import build_reset_email
+from app.utils.security import get_password_hash_async
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +47,75 @@ def _hash_code(code: str) -> str:
     return hashlib.sha256(code.encode()).hexdigest()
 
 
+async def _check_code(email: str, code: str) -> dict:
+    """
+    Valida o código e conta a tentativa num único find_one_and_update: o
+    pipeline compara o hash e incrementa attempts só quando erra, então
+    tentativas simultâneas não escapam do limite. Levanta HTTPException com
+    a mensagem da rota.
+    """
+    codes_collection = await get_password_reset_codes_collection()
+    code_hash = _hash_code(code.strip())
+    matched = {"$eq": ["$code_hash", code_hash]}
+
+    doc = await codes_collection.find_one_and_update(
+        {"email": email, "expires_at": {"$gt": datetime.utcnow()}, "attempts": {"$lt": _MAX_ATTEMPTS}},
+        [{"$set": {
+            "matched":  matched,
+            "attempts": {"$cond": [matched, "$attempts", {"$add": ["$attempts", 1]}]},
+        }}],
+        projection={"matched": 1, "attempts": 1, "user_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if doc is None:
+        # Caminho de erro: só aqui lemos de novo, para escolher a mensagem
+        current = await codes_collection.find_one({"email": email}, {"attempts": 1, "expires_at": 1})
+        if not current:
+            raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
+        if current["expires_at"] <= datetime.utcnow():
+            raise HTTPException(status_code=400, detail="Código expirado. Solicite um novo.")
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas tentativas incorretas. Solicite um novo código."
+        )
+
+    if not doc["matched"]:
+        remaining = _MAX_ATTEMPTS - doc["attempts"]
+        raise HTTPException(
+            status_code=400,
+            detail=f"Código incorreto. {remaining} tentativa(s) restante(s)."
+        )
+
+    return doc
+
+
+async def _consume_code(doc_id, code: str) -> dict:
+    """
+    Remove o código (uso único), condicionado ao mesmo hash: dois resets
+    simultâneos com o mesmo código, ou um código novo pedido no meio, e só
+    um passa. Devolve o documento removido, para _restore_code.
+    """
+    codes_collection = await get_password_reset_codes_collection()
+    removed = await codes_collection.find_one_and_delete(
+        {"_id": doc_id, "code_hash": _hash_code(code.strip())}
+    )
+    if removed is None:
+        raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
+    return removed
+
+
+async def _restore_code(removed: dict) -> None:
+    """Devolve o código consumido quando a troca de senha falhou depois."""
+    codes_collection = await get_password_reset_codes_collection()
+    try:
+        await codes_collection.insert_one(removed)
+    except DuplicateKeyError:
+        pass    # o usuário já pediu um código novo: vale o novo
+    except PyMongoError as e:
+        logger.error(f"❌ Erro ao restaurar código de {removed.get('email')}: {e}")
+
+
 # ── POST /auth/forgot-password ────────────────────────────────────────────────
 class ForgotPasswordRequest(BaseModel):
     email: EmailStr
@@ -54,7 +128,7 @@ async def forgot_password(body: ForgotPasswordRequest):
     Retorna 200 mesmo se o e-mail não existir (evita enumeração de usuários).
     """
     users_collection = await get_users_collection()
-    user = await users_collection.find_one({"email": body.email})
+    user = await users_collection.find_one({"email": body.email}, {"name": 1})
 
     # Resposta genérica para não vazar se e-mail existe
     generic_ok = {"message": "Se o e-mail estiver cadastrado, você receberá o código em breve."}
@@ -66,32 +140,38 @@ async def forgot_password(body: ForgotPasswordRequest):
     code  = _generate_code()
     expiry = datetime.utcnow() + timedelta(minutes=_CODE_EXPIRY_MINUTES)
 
-    # Salva hash do código + expiração no documento do usuário
-    await users_collection.update_one(
-        {"email": body.email},
-        {
-            "$set": {
-                "reset_code_hash":    _hash_code(code),
-                "reset_code_expiry":  expiry,
-                "reset_code_attempts": 0,
-            }
+    # Um código ativo por e-mail; um novo pedido substitui o anterior.
+    # O documento do usuário não é tocado.
+    codes_collection = await get_password_reset_codes_collection()
+    update = {
+        "$set": {
+            "user_id":    str(user["_id"]),
+            "code_hash":  _hash_code(code),
+            "expires_at": expiry,
+            "attempts":   0,
+            "created_at": datetime.utcnow(),
         },
-    )
-
-    # Envia e-mail em background (não bloqueia a resposta)
+        "$unset": {"matched": ""},
+    }
+    try:
+        await codes_collection.update_one({"email": body.email}, update, upsert=True)
+    except DuplicateKeyError:
+        # Dois pedidos simultâneos: o outro upsert criou o documento entre a
+        # busca e o insert. Agora ele existe — substitui o código sem upsert.
+        await codes_collection.update_one({"email": body.email}, update)
+
+    # Enfileira no email_outbox; o despachante envia em background
+    # (app/utils/outbox.py) e a resposta não espera o SMTP
     try:
         html = build_reset_email(nome, code)
-        await send_email(body.email, "Código para redefinir sua senha — Financeiro App", html)
+        await outbox.enqueue(body.email, "Código para redefinir sua senha — Financeiro App", html)
     except Exception as e:
-        logger.error(f"Erro ao enviar e-mail de recuperação para {body.email}: {e}")
+        logger.error(f"Erro ao enfileirar e-mail de recuperação para {body.email}: {e}")
         # Limpa código se e-mail falhou para não deixar lixo no banco
-        await users_collection.update_one(
-            {"email": body.email},
-            {"$unset": {"reset_code_hash": "", "reset_code_expiry": "", "reset_code_attempts": ""}}
-        )
+        await codes_collection.delete_one({"email": body.email})
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Erro ao enviar e-mail. Verifique as configurações de SMTP no servidor."
+            detail="Erro ao enviar e-mail. Tente novamente em instantes."
         )
 
     return generic_ok
@@ -109,37 +189,7 @@ async def verify_code(body: VerifyCodeRequest):
     Valida se o código está correto e não expirou.
     Chamado antes de mostrar o campo de nova senha (UX mais suave).
     """
-    users_collection = await get_users_collection()
-    user = await users_collection.find_one({"email": body.email})
-
-    if not user or "reset_code_hash" not in user:
-        raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
-
-    # Verifica tentativas
-    attempts = user.get("reset_code_attempts", 0)
-    if attempts >= _MAX_ATTEMPTS:
-        raise HTTPException(
-            status_code=429,
-            detail="Muitas tentativas incorretas. Solicite um novo código."
-        )
-
-    # Verifica expiração
-    expiry = user.get("reset_code_expiry")
-    if not expiry or datetime.utcnow() > expiry:
-        raise HTTPException(status_code=400, detail="Código expirado. Solicite um novo.")
-
-    # Verifica código
-    if _hash_code(body.code.strip()) != user["reset_code_hash"]:
-        await users_collection.update_one(
-            {"email": body.email},
-            {"$inc": {"reset_code_attempts": 1}}
-        )
-        remaining = _MAX_ATTEMPTS - attempts - 1
-        raise HTTPException(
-            status_code=400,
-            detail=f"Código incorreto. {remaining} tentativa(s) restante(s)."
-        )
-
+    await _check_code(body.email, body.code)
     return {"message": "Código válido.", "valid": True}
 
 
@@ -150,52 +200,34 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
-@router.post("/reset-password", status_code=status.HTTP_200_OK)
+@router.post("/reset-password", status_code=status.HTTP_200_OK,
+             dependencies=[Depends(password_route("reset-password"))])
 async def reset_password(body: ResetPasswordRequest):
     """
     Valida código e redefine a senha.
-    Após sucesso, remove o código do banco (uso único).
+    O código só é consumido (uso único) depois do hash da nova senha, logo
+    antes do update do usuário; se o update falhar, o código volta.
     """
     if len(body.new_password) < 6:
         raise HTTPException(status_code=400, detail="A senha deve ter no mínimo 6 caracteres.")
 
-    users_collection = await get_users_collection()
-    user = await users_collection.find_one({"email": body.email})
+    reset = await _check_code(body.email, body.code)
 
-    if not user or "reset_code_hash" not in user:
-        raise HTTPException(status_code=400, detail="Código inválido ou expirado.")
+    # 503 do pool de bcrypt aqui não gasta o código
+    new_hash = await get_password_hash_async(body.new_password)
 
-    attempts = user.get("reset_code_attempts", 0)
-    if attempts >= _MAX_ATTEMPTS:
-        raise HTTPException(
-            status_code=429,
-            detail="Muitas tentativas. Solicite um novo código."
-        )
-
-    expiry = user.get("reset_code_expiry")
-    if not expiry or datetime.utcnow() > expiry:
-        raise HTTPException(status_code=400, detail="Código expirado. Solicite um novo.")
-
-    if _hash_code(body.code.strip()) != user["reset_code_hash"]:
+    removed = await _consume_code(reset["_id"], body.code)
+    users_collection = await get_users_collection()
+    try:
         await users_collection.update_one(
             {"email": body.email},
-            {"$inc": {"reset_code_attempts": 1}}
+            {"$set": {"hashed_password": new_hash, "updated_at": datetime.utcnow()}},
         )
-        raise HTTPException(status_code=400, detail="Código incorreto.")
-
-    # Atualiza senha e limpa campos de reset
-    new_hash = get_password_hash(body.new_password)
-    await users_collection.update_one(
-        {"email": body.email},
-        {
-            "$set":   {"hashed_password": new_hash, "updated_at": datetime.utcnow()},
-            "$unset": {
-                "reset_code_hash":     "",
-                "reset_code_expiry":   "",
-                "reset_code_attempts": "",
-            },
-        },
-    )
+    except Exception:
+        await _restore_code(removed)
+        raise
+
+    user_cache.invalidate(reset.get("user_id"))
 
     logger.info(f"✅ Senha redefinida para: {body.email}")
     return {"message": "Senha redefinida com sucesso!"}
\ No newline at end of file
@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from fastapi.responses import Response
 from app.database import get_projects_collection, get_users_collection
 from app.models.project import (
-    ProjectCreate, ProjectDB, ProjectUpdate,
-    DepositResponse, TransactionDB,          # ← NOVOS imports
+    ProjectCreate, ProjectDB, ProjectPage, ProjectUpdate,
+    DepositResponse, TransactionDB, TransactionPage,          # ← NOVOS imports
+    BatchDepositRequest, BatchDepositResponse,
 )
 from app.models.user import UserDB
+from app.utils import etag, idempotency, user_cache
+from app.utils.fast_json import FastJSONResponse
+from app.utils.loaders import BatchLoader
+from app.utils.streaming import STREAM_BATCH_SIZE, batched, stream_list
+from app.utils.deposits import (
+    ProjectNotFound, apply_deposit, apply_deposits_batch, calculate_progress,
+)
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page, is_paginated
 from app.utils.security import get_current_user
+from app.utils.transactions_store import (
+    delete_project_transactions, iter_transactions, list_transactions_page,
+    load_transactions, migrate_project, prepare_project, project_projection, to_project_out,
+)
+from app.utils.sync import record_deletion
+from app.utils.user_stats import record_project
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Union
 from pydantic import BaseModel
 import logging
 
@@ -25,11 +41,33 @@ router = APIRouter(
 )
 
 
-def calculate_progress(applied: float, required: float) -> float:
-    """Idêntico ao original."""
-    if required == 0:
-        return 0.0
-    return min(round((applied / required) * 100, 2), 100.0)
+# Campos usados por record_project (user_stats) e pelo cálculo de progresso
+_STATS_FIELDS = {
+    "title": 1, "category": 1, "applied_value": 1, "required_value": 1, "start_date": 1,
+}
+
+
+# GET /projects/{id}: buscas simultâneas viram um $in (ver app/utils/loaders.py)
+_project_loaders = {
+    include: BatchLoader(get_projects_collection, project_projection(include))
+    for include in (None, "transactions")
+}
+
+
+async def _attach_history(projects: List[dict], include: Optional[str]) -> None:
+    """Com ?include=transactions, troca o subset pelo histórico dos buckets."""
+    if include != "transactions":
+        return
+    bucketed = [p for p in projects if not p.get("legacy_transactions")]
+    if not bucketed:
+        return
+    history = await load_transactions([str(p["_id"]) for p in bucketed])
+    for project in bucketed:
+        project["transactions"] = history[str(project["_id"])]
+
+
+def _to_project_db(project: dict) -> ProjectDB:
+    return ProjectDB(**prepare_project(project))
 
 
 # ── POST /projects/ ─────────────────────────── ORIGINAL + inicializa transactions
@@ -48,6 +86,7 @@ async def create_project(
         "updated_at":   datetime.utcnow(),
         "progress":     calculate_progress(project.applied_value, project.required_value),
         "transactions": [],    # ← NOVO campo: lista vazia ao criar
+        "transactions_count": 0,
     })
 
     result = await projects_collection.insert_one(project_dict)
@@ -58,46 +97,74 @@ async def create_project(
         {"_id": ObjectId(current_user.id)},
         {"$inc": {"projects_count": 1}}
     )
+    user_cache.invalidate(current_user.id)
+    await record_project(current_user.id, None, project_dict)
 
     return ProjectDB(**project_dict)
 
 
 # ── GET /projects/ ────────────────────── ORIGINAL + retrocompatibilidade transactions
-@router.get("/", response_model=List[ProjectDB])
-async def list_user_projects(current_user: UserDB = Depends(get_current_user)):
+# Sem limit/cursor devolve a lista completa (formato esperado pelo Flutter);
+# com eles, uma página {items, next_cursor} ordenada por (created_at, _id)
+# If-None-Match com o ETag atual → 304 sem tocar na coleção (ver utils/etag.py)
+@router.get("/", response_model=Union[List[ProjectDB], ProjectPage])
+async def list_user_projects(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    include: Optional[str] = None,
+    current_user: UserDB = Depends(get_current_user),
+):
+    tag, not_modified = await etag.check(request, current_user.id)
+    if not_modified:
+        return not_modified
+
     projects_collection = await get_projects_collection()
-    projects = []
-    async for project in projects_collection.find({"user_id": current_user.id}):
-        project["id"] = str(project["_id"])
-        if "transactions" not in project:
-            project["transactions"] = []    # projetos antigos sem o campo
-        projects.append(ProjectDB(**project))
-    return projects
+    projection = project_projection(include)
+
+    if is_paginated(limit, cursor):
+        docs, next_cursor = await fetch_page(
+            projects_collection, {"user_id": current_user.id}, limit, cursor, order,
+            projection=projection,
+        )
+        await _attach_history(docs, include)
+        return etag.tag(FastJSONResponse({
+            "items": [to_project_out(p) for p in docs], "next_cursor": next_cursor,
+        }), tag)
+
+    # Lista completa: em streaming, lote a lote direto do cursor
+    docs_cursor = projects_collection.find(
+        {"user_id": current_user.id}, projection
+    ).batch_size(STREAM_BATCH_SIZE)
+
+    async def batches():
+        async for docs in batched(docs_cursor):
+            await _attach_history(docs, include)
+            yield [to_project_out(p) for p in docs]
+
+    return etag.tag(stream_list(request, batches()), tag)
 
 
 # ── GET /projects/{project_id} ───────── ORIGINAL + retrocompatibilidade transactions
 @router.get("/{project_id}", response_model=ProjectDB)
 async def get_project(
     project_id: str,
+    include: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user)
 ):
-    projects_collection = await get_projects_collection()
     try:
         obj_id = ObjectId(project_id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID do projeto inválido")
 
-    project = await projects_collection.find_one({
-        "_id": obj_id,
-        "user_id": current_user.id
-    })
-    if not project:
+    loader = _project_loaders.get(include, _project_loaders[None])
+    project = await loader.load(obj_id)
+    if not project or project.get("user_id") != current_user.id:
         raise HTTPException(status_code=404, detail="Projeto não encontrado")
 
-    project["id"] = str(project["_id"])
-    if "transactions" not in project:
-        project["transactions"] = []
-    return ProjectDB(**project)
+    await _attach_history([project], include)
+    return FastJSONResponse(to_project_out(project))
 
 
 # ── PUT /projects/{project_id} ──────────────────────────────────── ORIGINAL
@@ -105,6 +172,7 @@ async def get_project(
 async def update_project(
     project_id: str,
     project_update: ProjectUpdate,
+    include: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
 ):
     projects_collection = await get_projects_collection()
@@ -119,7 +187,7 @@ async def update_project(
     existing_project = await projects_collection.find_one({
         "_id": obj_id,
         "user_id": current_user.id
-    })
+    }, _STATS_FIELDS)
     if not existing_project:
         raise HTTPException(status_code=404, detail="Projeto não encontrado")
 
@@ -127,19 +195,20 @@ async def update_project(
     required = update_data.get("required_value", existing_project.get("required_value", 0.0))
     update_data["progress"] = calculate_progress(applied, required)
 
-    result = await projects_collection.update_one(
+    updated_project = await projects_collection.find_one_and_update(
         {"_id": obj_id, "user_id": current_user.id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection=project_projection(include),
+        return_document=ReturnDocument.AFTER,
     )
 
-    if result.modified_count == 0:
+    if updated_project is None:
         raise HTTPException(status_code=404, detail="Projeto não encontrado ou sem alterações")
 
-    updated_project = await projects_collection.find_one({"_id": obj_id})
-    updated_project["id"] = str(updated_project["_id"])
-    if "transactions" not in updated_project:
-        updated_project["transactions"] = []
-    return ProjectDB(**updated_project)
+    await record_project(current_user.id, existing_project, updated_project)
+
+    await _attach_history([updated_project], include)
+    return _to_project_db(updated_project)
 
 
 # ── DELETE /projects/{project_id} ───────────────────────────────── ORIGINAL
@@ -156,20 +225,23 @@ async def delete_project(
     except Exception:
         raise HTTPException(status_code=400, detail="ID do projeto inválido")
 
-    project = await projects_collection.find_one({
+    project = await projects_collection.find_one_and_delete({
         "_id": obj_id,
         "user_id": current_user.id
-    })
+    }, projection=_STATS_FIELDS)
     if not project:
         raise HTTPException(status_code=404, detail="Projeto não encontrado")
 
-    await projects_collection.delete_one({"_id": obj_id})
+    await delete_project_transactions(project_id)
 
     # Atualiza contador de projetos do usuário
     await users_collection.update_one(
         {"_id": ObjectId(current_user.id)},
         {"$inc": {"projects_count": -1}}
     )
+    user_cache.invalidate(current_user.id)
+    await record_project(current_user.id, project, None)
+    await record_deletion(current_user.id, "project", [project_id])
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -187,10 +259,14 @@ class DepositBody(BaseModel):
 # Chamado por ProjetoService.depositar() no Flutter
 # Recebe apenas o valor do APORTE — nunca o total
 # Backend soma ao applied_value, salva transação, atualiza total_invested do usuário
+# Com o header Idempotency-Key, a repetição devolve o DepositResponse da
+# primeira execução sem aplicar de novo (ver app/utils/idempotency.py)
 @router.post("/{project_id}/deposit", response_model=DepositResponse)
 async def deposit(
     project_id: str,
     body: DepositBody,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=128),
     current_user: UserDB = Depends(get_current_user),
 ):
     if body.amount <= 0:
@@ -199,68 +275,82 @@ async def deposit(
             detail="O valor do aporte deve ser maior que zero"
         )
 
-    projects_collection = await get_projects_collection()
-    users_collection    = await get_users_collection()
-
     try:
         obj_id = ObjectId(project_id)
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    project = await projects_collection.find_one({
-        "_id": obj_id,
-        "user_id": current_user.id
-    })
-    if not project:
-        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    # Um único find_one_and_update calcula o novo valor no servidor
+    # (ver app/utils/deposits.py) — sem corrida entre aportes simultâneos
+    async def run() -> dict:
+        try:
+            result = await apply_deposit(current_user.id, obj_id, body.amount, body.note)
+        except ProjectNotFound:
+            raise HTTPException(status_code=404, detail="Projeto não encontrado")
+        return result.dict()
 
-    previous  = project.get("applied_value", 0.0)
-    required  = project.get("required_value", 0.0)
-    new_value = round(previous + body.amount, 2)
-    progress  = calculate_progress(new_value, required)
-
-    # Registro da transação embutido no documento do projeto
-    transaction = {
-        "id":         str(ObjectId()),
-        "amount":     body.amount,
-        "note":       body.note,
-        "created_at": datetime.utcnow(),
-    }
-
-    await projects_collection.update_one(
-        {"_id": obj_id},
-        {
-            "$set": {
-                "applied_value": new_value,
-                "progress":      progress,
-                "updated_at":    datetime.utcnow(),
-            },
-            "$push": {"transactions": transaction},
-        },
-    )
+    if not idempotency_key:
+        return DepositResponse(**await run())
 
-    # Incrementa total_invested do usuário
-    await users_collection.update_one(
-        {"_id": ObjectId(current_user.id)},
-        {"$inc": {"total_invested": body.amount}}
-    )
+    fingerprint = f"{project_id}:{body.amount!r}:{body.note}"
+    try:
+        result, replayed = await idempotency.run_once(
+            current_user.id, "deposit", idempotency_key, fingerprint, run
+        )
+    except idempotency.KeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key já usada com outro aporte"
+        )
+    except idempotency.KeyBusy:
+        raise HTTPException(
+            status_code=409,
+            detail="Aporte com esta Idempotency-Key ainda em andamento",
+            headers={"Retry-After": "1"},
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return DepositResponse(**result)
 
-    return DepositResponse(
-        project_id=    project_id,
-        previous_value=previous,
-        deposited=     body.amount,
-        new_value=     new_value,
-        progress=      progress,
-        required_value=required,
-    )
+
+# ── POST /projects/deposits/batch ────────────────────────────────────────────
+# Vários aportes (ex.: divisão do salário entre projetos) em uma requisição:
+# posse validada com um $in, histórico em um bulk_write e total_invested
+# incrementado uma vez. Resultado por item: DepositResponse ou erro.
+MAX_BATCH_DEPOSITS = 100
+
+
+@router.post("/deposits/batch", response_model=BatchDepositResponse)
+async def deposit_batch(
+    body: BatchDepositRequest,
+    current_user: UserDB = Depends(get_current_user),
+):
+    if not body.deposits:
+        raise HTTPException(status_code=400, detail="Nenhum aporte informado")
+    if len(body.deposits) > MAX_BATCH_DEPOSITS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {MAX_BATCH_DEPOSITS} aportes por requisição"
+        )
+
+    results = await apply_deposits_batch(current_user.id, body.deposits, body.ordered)
+    return BatchDepositResponse(results=results)
 
 
 # ── GET /projects/{project_id}/transactions ───────────────────────────── NOVO
 # Chamado por TransacaoService.listar() no Flutter
-# Retorna histórico de aportes do projeto
-@router.get("/{project_id}/transactions", response_model=List[TransactionDB])
+# Retorna histórico de aportes do projeto, lido dos buckets em ordem de tempo
+# Sem limit/cursor devolve a lista completa; com eles, {items, next_cursor}
+# 304 com If-None-Match atual, antes de ler os buckets
+@router.get(
+    "/{project_id}/transactions",
+    response_model=Union[List[TransactionDB], TransactionPage],
+)
 async def list_transactions(
+    request: Request,
     project_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
 ):
     projects_collection = await get_projects_collection()
@@ -273,18 +363,38 @@ async def list_transactions(
     project = await projects_collection.find_one({
         "_id": obj_id,
         "user_id": current_user.id
-    })
+    }, {"transactions_count": 1})
     if not project:
         raise HTTPException(status_code=404, detail="Projeto não encontrado")
 
-    return [
-        TransactionDB(
-            id=         t.get("id", str(ObjectId())),
-            project_id= project_id,
-            user_id=    current_user.id,
-            amount=     t["amount"],
-            note=       t.get("note", ""),
-            created_at= t["created_at"],
+    tag, not_modified = await etag.check(request, current_user.id)
+    if not_modified:
+        return not_modified
+
+    if "transactions_count" not in project:
+        await migrate_project(obj_id)
+
+    # Formato do TransactionDB montado direto, sem validação (ver fast_json)
+    def to_model(t: dict) -> dict:
+        return {
+            "id":         t["id"],
+            "project_id": project_id,
+            "user_id":    current_user.id,
+            "amount":     float(t["amount"]),
+            "note":       t.get("note", ""),
+            "created_at": t["created_at"],
+        }
+
+    if is_paginated(limit, cursor):
+        items, next_cursor = await list_transactions_page(
+            project_id, limit or DEFAULT_PAGE_SIZE, cursor
         )
-        for t in project.get("transactions", [])
-    ]
\ No newline at end of file
+        return etag.tag(FastJSONResponse({
+            "items": [to_model(t) for t in items], "next_cursor": next_cursor,
+        }), tag)
+
+    async def batches():
+        async for items in batched(iter_transactions(project_id)):
+            yield [to_model(t) for t, _ in items]
+
+    return etag.tag(stream_list(request, batches()), tag)
\ No newline at end of file
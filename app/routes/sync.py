@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+
+from app.database import (
+    get_notes_collection, get_project_transactions_collection, get_projects_collection,
+)
+from app.models.note import NoteDB
+from app.models.sync import SyncResponse
+from app.models.user import UserDB
+from app.utils.fast_json import FastJSONResponse, to_public
+from app.utils.security import get_current_user
+from app.utils.sync import deletions_since, encode_token, window_start
+from app.utils.transactions_store import migrate_project, project_projection, to_project_out
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+# ── GET /sync?since=<token> ───────────────────────────────────────────── NOVO
+# Projetos, anotações e aportes criados ou alterados depois do token, mais os
+# ids excluídos (sync_tombstones). Sem token: estado completo (full=true).
+# Cada consulta é um range scan em (user_id, updated_at) — ver utils/sync.py
+@router.get("/", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = None,
+    current_user: UserDB = Depends(get_current_user),
+):
+    started_at = datetime.utcnow()
+    window = window_start(since, started_at)
+    changed = {"user_id": current_user.id}
+    if window is not None:
+        changed["updated_at"] = {"$gte": window}
+
+    projects_collection = await get_projects_collection()
+    projects = await projects_collection.find(changed, project_projection()).to_list(length=None)
+
+    # Histórico ainda embutido no projeto: vai para os buckets antes de lê-los
+    for project in projects:
+        if project.get("legacy_transactions"):
+            await migrate_project(project["_id"])
+
+    notes_collection = await get_notes_collection()
+    notes = await notes_collection.find(changed).to_list(length=None)
+
+    transactions = []
+    buckets_collection = await get_project_transactions_collection()
+    async for bucket in buckets_collection.find(changed, {"project_id": 1, "transactions": 1}):
+        for t in bucket.get("transactions", []):
+            if window is None or t["created_at"] >= window:
+                transactions.append({
+                    "id":         t["id"],
+                    "project_id": bucket["project_id"],
+                    "user_id":    current_user.id,
+                    "amount":     float(t["amount"]),
+                    "note":       t.get("note", ""),
+                    "created_at": t["created_at"],
+                })
+
+    deleted = {"projects": [], "notes": []}
+    if window is not None:
+        tombstones = await deletions_since(current_user.id, window)
+        deleted = {"projects": tombstones["project"], "notes": tombstones["note"]}
+        # Alterado e excluído dentro da mesma janela: vale a exclusão
+        gone = set(deleted["projects"])
+        projects = [p for p in projects if str(p["_id"]) not in gone]
+        transactions = [t for t in transactions if t["project_id"] not in gone]
+        gone = set(deleted["notes"])
+        notes = [n for n in notes if str(n["_id"]) not in gone]
+
+    return FastJSONResponse({
+        "projects":     [to_project_out(p) for p in projects],
+        "notes":        [to_public(n, NoteDB) for n in notes],
+        "transactions": transactions,
+        "deleted":      deleted,
+        "sync_token":   encode_token(started_at),
+        "full":         window is None,
+    })
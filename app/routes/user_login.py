@@ -1,29 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError
+from typing import Optional
+from datetime import datetime
 from app.database import get_users_collection
-from app.models.user import Token, TokenUser  # Incluímos o modelo TokenUser
-from app.utils.security import verify_password, create_access_token
+from app.models.user import RefreshRequest, RefreshResponse, Token, TokenUser  # Incluímos o modelo TokenUser
+from app.utils import loaders, revocation
+from app.utils.rate_limit import password_route
+from app.utils.security import (
+    create_access_token, create_refresh_token, decode_token, get_password_hash_async,
+    oauth2_scheme, password_needs_rehash, refresh_family_expiry, verify_password_async,
+)
 from bson import ObjectId
+from bson.errors import InvalidId
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
 )
 
-@router.post("/login", response_model=Token)
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
+async def _rehash_password(user_id: ObjectId, password: str, old_hash: str) -> None:
+    """Refaz o hash com o custo calibrado; só grava se a senha não mudou no meio."""
+    try:
+        new_hash = await get_password_hash_async(password)
+        users_collection = await get_users_collection()
+        await users_collection.update_one(
+            {"_id": user_id, "hashed_password": old_hash},
+            {"$set": {"hashed_password": new_hash}},
+        )
+    except Exception as e:
+        logger.warning(f"Rehash de senha adiado para {user_id}: {e}")
+
+
+@router.post("/login", response_model=Token,
+             dependencies=[Depends(password_route("login"))])
+async def login_user(
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+):
     users_collection = await get_users_collection()
 
     # Busca o usuário no banco pelo email (form_data.username)
     user = await users_collection.find_one({"email": form_data.username})
     
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password_async(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Hash com custo diferente do calibrado: refaz depois da resposta
+    if password_needs_rehash(user["hashed_password"]):
+        background_tasks.add_task(
+            _rehash_password, user["_id"], form_data.password, user["hashed_password"]
+        )
+
     # Cria o token JWT com o ID do usuário como subject (sub)
     access_token = create_access_token(data={"sub": str(user["_id"])})
 
@@ -41,6 +76,76 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
 
     return {
         "access_token": access_token,
+        "refresh_token": create_refresh_token(str(user["_id"])),
         "token_type": "bearer",
         "user": user_response  # Retorna também os dados do usuário autenticado
-    }
\ No newline at end of file
+    }
+
+
+_INVALID_REFRESH = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Sessão expirada. Faça login novamente.",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+# ── POST /auth/refresh ────────────────────────────────────────────────────────
+# Troca o refresh token por um novo par (rotação: o antigo é revogado).
+# Não passa pelo bcrypt — só assinatura, revogação e um lookup por _id.
+# Uso único garantido no banco: a revogação do jti é atômica, e só quem a fez
+# recebe o par novo. Token já usado (replay, refresh simultâneo ou roubado)
+# revoga a família inteira — a sessão legítima também precisa logar de novo.
+@router.post("/refresh", response_model=RefreshResponse)
+async def refresh_token(body: RefreshRequest):
+    try:
+        payload = decode_token(body.refresh_token, token_type="refresh")
+        user = await loaders.users.load(ObjectId(payload["sub"]))
+    except (JWTError, KeyError, InvalidId):
+        raise _INVALID_REFRESH
+    if user is None or user.get("disabled", False):
+        raise _INVALID_REFRESH
+
+    user_id = str(user["_id"])
+    # Tokens emitidos antes das famílias começam uma a partir do próprio jti
+    family = payload.get("fam") or payload["jti"]
+    family_key = revocation.family_key(family)
+
+    first_use = await revocation.revoke(
+        payload["jti"], user_id, datetime.utcfromtimestamp(payload["exp"])
+    )
+    if not first_use:
+        logger.warning(f"Refresh token reutilizado para {user_id}: sessão revogada")
+        await revocation.revoke(family_key, user_id, refresh_family_expiry())
+        raise _INVALID_REFRESH
+    if await revocation.is_revoked_in_store(family_key):
+        raise _INVALID_REFRESH
+
+    return {
+        "access_token":  create_access_token(data={"sub": user_id}),
+        "refresh_token": create_refresh_token(user_id, family),
+        "token_type":    "bearer",
+    }
+
+
+# ── POST /auth/logout ─────────────────────────────────────────────────────────
+# Revoga o access token do header e, se enviado, o refresh token e sua família.
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: Optional[RefreshRequest] = None, token: str = Depends(oauth2_scheme)):
+    tokens = [(token, "access")]
+    if body is not None:
+        tokens.append((body.refresh_token, "refresh"))
+
+    for raw, token_type in tokens:
+        try:
+            payload = decode_token(raw, token_type=token_type)
+        except JWTError:
+            continue    # já expirado ou revogado
+        if payload.get("jti"):
+            await revocation.revoke(
+                payload["jti"], payload.get("sub"), datetime.utcfromtimestamp(payload["exp"])
+            )
+        if payload.get("fam"):
+            await revocation.revoke(
+                revocation.family_key(payload["fam"]), payload.get("sub"), refresh_family_expiry()
+            )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -2,7 +2,9 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from bson import ObjectId
 from app.models.user import UserCreate, UserDB
 from app.database import get_users_collection
-from app.utils.security import get_password_hash, get_current_user   # ← get_current_user adicionado
+from app.utils.security import get_password_hash_async, get_current_user   # ← get_current_user adicionado
+from app.utils import loaders
+from app.utils.rate_limit import password_route
 from datetime import datetime
 import logging
 
@@ -15,7 +17,8 @@ logger = logging.getLogger(__name__)
 
 
 # ── POST /users/register ──────────────────────────────────────── ORIGINAL
-@router.post("/register", response_model=UserDB, status_code=status.HTTP_201_CREATED)
+@router.post("/register", response_model=UserDB, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(password_route("register"))])
 async def register(user: UserCreate):
     users_collection = await get_users_collection()
 
@@ -28,7 +31,7 @@ async def register(user: UserCreate):
         )
 
     # Criptografa a senha
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
 
     # Monta os dados para o MongoDB
     user_data = {
@@ -69,13 +72,11 @@ async def get_profile(current_user: UserDB = Depends(get_current_user)):
 # ── GET /users/{user_id} ──────────────────────────────────────────── ORIGINAL
 @router.get("/{user_id}", response_model=UserDB)
 async def get_user_by_id(user_id: str):
-    users_collection = await get_users_collection()
-
     # Valida o ID do MongoDB
     if not ObjectId.is_valid(user_id):
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await loaders.users.load(ObjectId(user_id))
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
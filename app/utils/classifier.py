@@ -0,0 +1,135 @@
+"""
+Classificador de categorias das anotações.
+
+Todas as palavras-chave viram uma única regex compilada, percorrida uma vez
+por texto. A comparação ignora acentos e maiúsculas ("manutenção" casa com
+"manutencao"), então basta cadastrar cada palavra uma vez.
+
+A prioridade segue a ordem das regras: a primeira categoria com alguma
+palavra presente no texto vence. As regras do usuário (coleção
+category_rules) vêm antes das regras padrão e ficam em cache já compiladas.
+"""
+
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.database import get_category_rules_collection
+
+DEFAULT_CATEGORY = "Outros"
+
+DEFAULT_RULES: Dict[str, List[str]] = {
+    "Lubrificantes": ["óleo", "lubrificante"],
+    "Manutenção":    ["manutenção", "alternador", "revisão", "bomba"],
+    "Peças":         ["peça", "bateria", "vela", "filtro", "kit"],
+    "Combustível":   ["combustível", "gasolina", "etanol"],
+}
+
+# Cache das regras compiladas por usuário. O TTL limita quanto tempo outro
+# worker pode usar regras antigas; no worker que editou a invalidação é imediata.
+RULES_CACHE_TTL_SECONDS = int(os.getenv("CATEGORY_RULES_CACHE_TTL", "300"))
+RULES_CACHE_MAX_SIZE    = int(os.getenv("CATEGORY_RULES_CACHE_SIZE", "1024"))
+
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos: "Manutenção" → "manutencao"."""
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", text)).casefold()
+
+
+class CategoryClassifier:
+    def __init__(self, rules: Sequence[Tuple[str, Sequence[str]]]):
+        # Mesma palavra em duas categorias: vale a de maior prioridade
+        self._category_of: Dict[str, str] = {}
+        for category, keywords in rules:
+            for keyword in keywords:
+                key = normalize(keyword.strip())
+                if key and key not in self._category_of:
+                    self._category_of[key] = category
+
+        self._priority = {}
+        for category, _ in rules:
+            self._priority.setdefault(category, len(self._priority))
+
+        # Lookahead permite casamentos sobrepostos (ex.: "bomba" e "bateria"
+        # em "bombateria"); alternativas em ordem de prioridade garantem que,
+        # na mesma posição, a categoria mais prioritária seja a reportada.
+        keywords = sorted(
+            self._category_of,
+            key=lambda k: (self._priority[self._category_of[k]], -len(k)),
+        )
+        self._regex = (
+            re.compile("(?=(" + "|".join(re.escape(k) for k in keywords) + "))")
+            if keywords else None
+        )
+
+    def classify(self, text: str) -> str:
+        if self._regex is None or not text:
+            return DEFAULT_CATEGORY
+        best = None
+        for match in self._regex.finditer(normalize(text)):
+            category = self._category_of[match.group(1)]
+            priority = self._priority[category]
+            if best is None or priority < best[0]:
+                best = (priority, category)
+                if priority == 0:
+                    break
+        return best[1] if best else DEFAULT_CATEGORY
+
+
+default_classifier = CategoryClassifier(list(DEFAULT_RULES.items()))
+
+
+# ── Regras por usuário ────────────────────────────────────────────────────────
+
+_cache: "OrderedDict[str, Tuple[float, CategoryClassifier]]" = OrderedDict()
+
+
+async def get_user_rules(user_id: str) -> List[dict]:
+    collection = await get_category_rules_collection()
+    doc = await collection.find_one({"_id": user_id})
+    return doc.get("rules", []) if doc else []
+
+
+async def save_user_rules(user_id: str, rules: List[dict]) -> None:
+    collection = await get_category_rules_collection()
+    await collection.update_one(
+        {"_id": user_id},
+        {"$set": {"rules": rules, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    invalidate(user_id)
+
+
+def invalidate(user_id: Optional[str] = None) -> None:
+    """Descarta o classificador em cache do usuário (ou de todos)."""
+    if user_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(user_id, None)
+
+
+async def get_classifier(user_id: str) -> CategoryClassifier:
+    cached = _cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < RULES_CACHE_TTL_SECONDS:
+        _cache.move_to_end(user_id)
+        return cached[1]
+
+    rules = await get_user_rules(user_id)
+    if rules:
+        classifier = CategoryClassifier(
+            [(r["category"], r["keywords"]) for r in rules] + list(DEFAULT_RULES.items())
+        )
+    else:
+        classifier = default_classifier
+
+    _cache[user_id] = (time.monotonic(), classifier)
+    _cache.move_to_end(user_id)
+    while len(_cache) > RULES_CACHE_MAX_SIZE:
+        _cache.popitem(last=False)
+    return classifier
@@ -0,0 +1,283 @@
+"""
+Aporte atômico em projeto.
+
+O projeto é alterado em um único find_one_and_update com update em pipeline:
+applied_value, progress e updated_at são calculados no servidor a partir do
+valor atual, então aportes concorrentes nunca se sobrescrevem. O pipeline
+grava o valor anterior em last_deposit, e o documento devolvido (pós-imagem)
+traz assim as duas pontas que o DepositResponse precisa.
+
+Em replica set, o update do projeto, o bucket de histórico e o $inc de
+total_invested do usuário rodam na mesma transação multi-documento
+(DEPOSIT_TRANSACTIONS=auto|on|off).
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+
+from app.database import (
+    DatabaseManager, get_projects_collection, get_project_transactions_collection,
+    get_users_collection,
+)
+from app.models.project import BatchDepositItem, BatchDepositResult, DepositResponse
+from app.utils import user_cache
+from app.utils.transactions_store import (
+    RECENT_TRANSACTIONS, append_transaction, bucket_upsert, migrate_project,
+)
+from app.utils.user_stats import record_project
+
+logger = logging.getLogger(__name__)
+
+DEPOSIT_TRANSACTIONS = os.getenv("DEPOSIT_TRANSACTIONS", "auto").lower()
+
+# Campos devolvidos pelo update: DepositResponse + record_project (user_stats)
+_RESULT_FIELDS = {
+    "applied_value": 1, "required_value": 1, "progress": 1, "last_deposit": 1,
+    "title": 1, "category": 1, "start_date": 1,
+}
+
+
+class ProjectNotFound(Exception):
+    pass
+
+
+def calculate_progress(applied: float, required: float) -> float:
+    """Idêntico ao original."""
+    if required == 0:
+        return 0.0
+    return min(round((applied / required) * 100, 2), 100.0)
+
+
+def deposit_pipeline(amount: float, transaction: dict) -> list:
+    """Update em pipeline equivalente a calculate_progress(round(prev + amount, 2))."""
+    applied  = {"$ifNull": ["$applied_value", 0.0]}
+    required = {"$ifNull": ["$required_value", 0.0]}
+    return [
+        {"$set": {
+            "last_deposit": {
+                "id":             transaction["id"],
+                "previous_value": applied,
+                "amount":         {"$literal": amount},
+            },
+            "applied_value": {"$round": [{"$add": [applied, {"$literal": amount}]}, 2]},
+            "updated_at":    "$$NOW",
+            # $literal: a observação do usuário pode começar com "$"
+            "transactions": {"$slice": [
+                {"$concatArrays": [
+                    {"$ifNull": ["$transactions", []]}, [{"$literal": transaction}],
+                ]},
+                -RECENT_TRANSACTIONS,
+            ]},
+            "transactions_count": {"$add": [{"$ifNull": ["$transactions_count", 0]}, 1]},
+        }},
+        {"$set": {
+            "progress": {"$cond": [
+                {"$eq": [required, 0]},
+                0.0,
+                {"$min": [
+                    {"$round": [{"$multiply": [{"$divide": ["$applied_value", required]}, 100]}, 2]},
+                    100.0,
+                ]},
+            ]},
+        }},
+    ]
+
+
+async def run_atomically(operation):
+    """
+    Executa operation(session) numa transação quando o deploy suporta
+    (com os retries de TransientTransactionError do driver); senão, direto.
+    """
+    db_manager = await DatabaseManager.get_instance()
+    enabled = DEPOSIT_TRANSACTIONS == "on" or (
+        DEPOSIT_TRANSACTIONS == "auto" and await db_manager.supports_transactions()
+    )
+    if not enabled:
+        return await operation(None)
+    async with await db_manager.client.start_session() as session:
+        return await session.with_transaction(operation)
+
+
+def _new_transaction(amount: float, note: str) -> dict:
+    return {
+        "id":         str(ObjectId()),
+        "amount":     amount,
+        "note":       note,
+        "created_at": datetime.utcnow(),
+    }
+
+
+async def _update_project(project_id: ObjectId, user_id: str, amount: float,
+                          transaction: dict, session) -> Optional[dict]:
+    projects_collection = await get_projects_collection()
+    # transactions_count existe só em projetos já migrados para os buckets —
+    # o pipeline cortaria o histórico embutido de um projeto antigo
+    return await projects_collection.find_one_and_update(
+        {"_id": project_id, "user_id": user_id, "transactions_count": {"$exists": True}},
+        deposit_pipeline(amount, transaction),
+        projection=_RESULT_FIELDS,
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+
+
+async def apply_deposit(user_id: str, project_id: ObjectId, amount: float,
+                        note: str = "") -> DepositResponse:
+    """Aplica o aporte; levanta ProjectNotFound se o projeto não for do usuário."""
+    projects_collection = await get_projects_collection()
+    users_collection    = await get_users_collection()
+
+    transaction = _new_transaction(amount, note)
+
+    async def write(session) -> Optional[dict]:
+        project = await _update_project(project_id, user_id, amount, transaction, session)
+        if project is not None:
+            await append_transaction(str(project_id), user_id, transaction, session=session)
+            await users_collection.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$inc": {"total_invested": amount}},
+                session=session,
+            )
+        return project
+
+    project = await run_atomically(write)
+    if project is None:
+        # Caminho raro: projeto inexistente ou antigo, com histórico embutido.
+        # A migração roda fora da transação e o aporte é refeito em seguida.
+        legacy = await projects_collection.find_one(
+            {"_id": project_id, "user_id": user_id}, {"_id": 1}
+        )
+        if legacy is None:
+            raise ProjectNotFound(str(project_id))
+        await migrate_project(project_id)
+        project = await run_atomically(write)
+        if project is None:
+            raise ProjectNotFound(str(project_id))
+
+    user_cache.invalidate(user_id)    # total_invested mudou
+    previous = project["last_deposit"]["previous_value"]
+    await record_project(user_id, {**project, "applied_value": previous}, project)
+
+    return DepositResponse(
+        project_id=    str(project_id),
+        previous_value=previous,
+        deposited=     amount,
+        new_value=     project["applied_value"],
+        progress=      project["progress"],
+        required_value=project.get("required_value", 0.0),
+    )
+
+
+# ── Aportes em lote ───────────────────────────────────────────────────────────
+
+async def apply_deposits_batch(user_id: str, items: List[BatchDepositItem],
+                               ordered: bool = True) -> List[BatchDepositResult]:
+    """
+    Aplica vários aportes em uma requisição (e, em replica set, em uma
+    transação), com o histórico em um bulk_write e um único $inc de
+    total_invested.
+
+    Cada aporte é um find_one_and_update com pós-imagem: previous/new/progress
+    de cada item saem do próprio update, inclusive com aportes concorrentes
+    no mesmo projeto. O callback da transação pode ser repetido pelo driver,
+    então os resultados de cada tentativa ficam locais e só são copiados para
+    a resposta depois do commit.
+    """
+    projects_collection = await get_projects_collection()
+    buckets_collection  = await get_project_transactions_collection()
+    users_collection    = await get_users_collection()
+
+    results = [BatchDepositResult(index=i, project_id=item.project_id) for i, item in enumerate(items)]
+
+    # ── Validação + posse com um único $in ───────────────────────────────────
+    pending: List[int] = []
+    for i, item in enumerate(items):
+        if item.amount <= 0:
+            results[i].error = "O valor do aporte deve ser maior que zero"
+        elif not ObjectId.is_valid(item.project_id):
+            results[i].error = "ID inválido"
+        else:
+            pending.append(i)
+
+    ids = list({ObjectId(items[i].project_id) for i in pending})
+    owned = {
+        str(p["_id"]): p
+        async for p in projects_collection.find(
+            {"_id": {"$in": ids}, "user_id": user_id}, {"transactions_count": 1}
+        )
+    }
+    for pid, project in owned.items():
+        if "transactions_count" not in project:
+            await migrate_project(ObjectId(pid))
+
+    valid = []
+    for i in pending:
+        if items[i].project_id in owned:
+            valid.append(i)
+        else:
+            results[i].error = "Projeto não encontrado"
+    if not valid:
+        return results
+
+    transactions = {i: _new_transaction(items[i].amount, items[i].note) for i in valid}
+
+    async def write(session) -> Tuple[Dict[int, dict], Dict[int, str]]:
+        post: Dict[int, dict] = {}
+        errors: Dict[int, str] = {}
+        for i in valid:
+            if ordered and errors:
+                errors[i] = "Não aplicado: aporte anterior do lote falhou"
+                continue
+            try:
+                project = await _update_project(
+                    ObjectId(items[i].project_id), user_id, items[i].amount,
+                    transactions[i], session,
+                )
+            except OperationFailure as e:
+                if session is not None:
+                    raise    # a transação já abortou no servidor; o driver decide
+                errors[i] = (e.details or {}).get("errmsg") or "Erro ao aplicar aporte"
+                continue
+            if project is None:
+                # Projeto removido entre a validação e o update
+                errors[i] = "Projeto não encontrado"
+            else:
+                post[i] = project
+
+        if post:
+            await buckets_collection.bulk_write([
+                UpdateOne(*bucket_upsert(items[i].project_id, user_id, transactions[i]), upsert=True)
+                for i in post
+            ], ordered=True, session=session)
+            await users_collection.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$inc": {"total_invested": sum(items[i].amount for i in post)}},
+                session=session,
+            )
+        return post, errors
+
+    post, errors = await run_atomically(write)
+    for i, error in errors.items():
+        results[i].error = error
+    if post:
+        user_cache.invalidate(user_id)
+
+    for i, project in post.items():
+        previous = project["last_deposit"]["previous_value"]
+        results[i].result = DepositResponse(
+            project_id=    items[i].project_id,
+            previous_value=previous,
+            deposited=     items[i].amount,
+            new_value=     project["applied_value"],
+            progress=      project["progress"],
+            required_value=project.get("required_value", 0.0),
+        )
+        await record_project(user_id, {**project, "applied_value": previous}, project)
+
+    return results
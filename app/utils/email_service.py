@@ -7,44 +7,219 @@ Variáveis necessárias no .env:
   SMTP_USER     = seu-email@gmail.com
   SMTP_PASSWORD = sua-senha-de-app (não a senha normal — gere em myaccount.google.com)
   EMAIL_FROM    = "Financeiro App <seu-email@gmail.com>"
+Opcionais:
+  SMTP_STARTTLS = true   (false para servidores locais sem TLS)
+  SMTP_POOL_SIZE, SMTP_IDLE_TIMEOUT, SMTP_MAX_MESSAGES_PER_SESSION, SMTP_TIMEOUT
 """
 
 import os
+import queue
 import smtplib
+import threading
+import time
 import logging
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formataddr
 from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
-_executor = ThreadPoolExecutor(max_workers=2)
 
+# ── Pool de sessões SMTP ──────────────────────────────────────────────────────
+# Abrir conexão + EHLO + STARTTLS + LOGIN custa vários round-trips (e o TLS)
+# por e-mail. O pool mantém até SMTP_POOL_SIZE sessões já autenticadas e as
+# reutiliza; vários e-mails seguidos passam pela mesma sessão (só MAIL/RCPT/
+# DATA por mensagem). Sessões são recicladas após SMTP_IDLE_TIMEOUT segundos
+# paradas, SMTP_MAX_MESSAGES_PER_SESSION mensagens ou qualquer erro.
+SMTP_POOL_SIZE                = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_IDLE_TIMEOUT             = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+SMTP_MAX_MESSAGES_PER_SESSION = int(os.getenv("SMTP_MAX_MESSAGES_PER_SESSION", "100"))
+SMTP_TIMEOUT                  = float(os.getenv("SMTP_TIMEOUT", "15"))
 
-def _send_sync(to_email: str, subject: str, html_body: str) -> None:
-    """Envia e-mail de forma síncrona (executado em thread separada)."""
-    host     = os.getenv("SMTP_HOST",     "smtp.gmail.com")
-    port     = int(os.getenv("SMTP_PORT", "587"))
-    user     = os.getenv("SMTP_USER",     "")
-    password = os.getenv("SMTP_PASSWORD", "")
-    from_raw = os.getenv("EMAIL_FROM",    f"Financeiro App <{user}>")
 
-    if not user or not password:
-        raise ValueError("SMTP_USER e SMTP_PASSWORD não configurados no .env")
+_CONNECTION_LOST = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+
+class _Session:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp      = smtp
+        self.sent      = 0
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPPool:
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 starttls: bool = True, size: int = SMTP_POOL_SIZE):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.starttls = starttls
+        self.size = size
+        self._idle: "queue.LifoQueue[_Session]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.stats = {"connections": 0, "messages": 0, "reused": 0, "recycled": 0}
+
+    def _connect(self) -> _Session:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.user:
+            smtp.login(self.user, self.password)
+        self.stats["connections"] += 1
+        return _Session(smtp)
+
+    def _acquire(self) -> _Session:
+        self._slots.acquire()
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._slots.release()
+                    raise
+            if time.monotonic() - session.last_used > SMTP_IDLE_TIMEOUT:
+                # O servidor provavelmente já derrubou a conexão ociosa
+                self.stats["recycled"] += 1
+                session.close()
+                continue
+            self.stats["reused"] += 1
+            return session
+
+    def _release(self, session: _Session, broken: bool = False) -> None:
+        try:
+            if broken or session.sent >= SMTP_MAX_MESSAGES_PER_SESSION:
+                self.stats["recycled"] += 1
+                session.close()
+            else:
+                session.last_used = time.monotonic()
+                self._idle.put(session)
+        finally:
+            self._slots.release()
+
+    def send_many(self, messages: Iterable[Tuple[str, List[str], str]]) -> List[Optional[Exception]]:
+        """
+        Envia (remetente, destinatários, mensagem) em sequência na mesma
+        sessão e devolve o erro de cada mensagem, na ordem (None = enviada).
+        Recusa do servidor vale só para aquela mensagem. Queda da conexão no
+        meio: reabre uma vez e continua; se cair de novo, as mensagens que
+        faltam ficam com o erro.
+        """
+        messages = list(messages)
+        errors: List[Optional[Exception]] = [None] * len(messages)
+        session = self._acquire()
+        retried = False
+        index = 0
+        try:
+            while index < len(messages):
+                sender, recipients, raw = messages[index]
+                try:
+                    session.smtp.sendmail(sender, recipients, raw)
+                except OSError as e:    # SMTPException também é OSError
+                    if isinstance(e, smtplib.SMTPException) and not isinstance(e, _CONNECTION_LOST):
+                        # Destinatário, remetente ou conteúdo recusado: o smtplib
+                        # já mandou RSET e a sessão segue para a próxima
+                        errors[index] = e
+                        index += 1
+                        continue
+                    if retried:
+                        raise
+                    retried = True
+                    session.close()
+                    self.stats["recycled"] += 1
+                    session = self._connect()
+                    continue
+                index += 1
+                session.sent += 1
+                self.stats["messages"] += 1
+                if session.sent >= SMTP_MAX_MESSAGES_PER_SESSION and index < len(messages):
+                    session.close()
+                    self.stats["recycled"] += 1
+                    session = self._connect()
+        except Exception as e:
+            for i in range(index, len(messages)):
+                errors[i] = e
+            self._release(session, broken=True)
+            return errors
+        self._release(session)
+        return errors
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool: Optional[SMTPPool] = None
+_pool_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=SMTP_POOL_SIZE, thread_name_prefix="smtp")
+
 
+def _smtp_settings():
+    user = os.getenv("SMTP_USER", "")
+    return {
+        "host":     os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        "port":     int(os.getenv("SMTP_PORT", "587")),
+        "user":     user,
+        "password": os.getenv("SMTP_PASSWORD", ""),
+        "starttls": os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+        "from_raw": os.getenv("EMAIL_FROM", f"Financeiro App <{user}>"),
+    }
+
+
+def get_pool() -> SMTPPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            settings = _smtp_settings()
+            if not settings["user"] or not settings["password"]:
+                raise ValueError("SMTP_USER e SMTP_PASSWORD não configurados no .env")
+            _pool = SMTPPool(settings["host"], settings["port"], settings["user"],
+                             settings["password"], starttls=settings["starttls"])
+        return _pool
+
+
+def _build_message(to_email: str, subject: str, html_body: str) -> str:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
-    msg["From"]    = from_raw
+    msg["From"]    = _smtp_settings()["from_raw"]
     msg["To"]      = to_email
     msg.attach(MIMEText(html_body, "html", "utf-8"))
+    return msg.as_string()
 
-    with smtplib.SMTP(host, port, timeout=15) as smtp:
-        smtp.ehlo()
-        smtp.starttls()
-        smtp.login(user, password)
-        smtp.sendmail(user, [to_email], msg.as_string())
 
-    logger.info(f"✅ E-mail enviado para {to_email}")
+def _send_batch_sync(emails: List[Tuple[str, str, str]]) -> List[Optional[Exception]]:
+    """
+    Envia (destinatário, assunto, html) numa sessão do pool (executado em
+    thread). Devolve o erro de cada e-mail (None = enviado).
+    """
+    pool = get_pool()
+    errors = pool.send_many(
+        (pool.user, [to_email], _build_message(to_email, subject, html_body))
+        for to_email, subject, html_body in emails
+    )
+    for (to_email, _, _), error in zip(emails, errors):
+        if error is None:
+            logger.info(f"✅ E-mail enviado para {to_email}")
+    return errors
+
+
+def _send_sync(to_email: str, subject: str, html_body: str) -> None:
+    """Envia e-mail de forma síncrona (executado em thread separada)."""
+    error = _send_batch_sync([(to_email, subject, html_body)])[0]
+    if error is not None:
+        raise error
 
 
 async def send_email(to_email: str, subject: str, html_body: str) -> None:
@@ -54,6 +229,33 @@ async def send_email(to_email: str, subject: str, html_body: str) -> None:
     await loop.run_in_executor(_executor, _send_sync, to_email, subject, html_body)
 
 
+async def send_emails(emails: List[Tuple[str, str, str]]) -> List[Optional[Exception]]:
+    """
+    Vários e-mails divididos entre as sessões do pool, vários por sessão.
+    Devolve o erro de cada e-mail, na ordem recebida (None = enviado).
+    """
+    import asyncio
+    results: List[Optional[Exception]] = [None] * len(emails)
+    if not emails:
+        return results
+    loop = asyncio.get_event_loop()
+    sessions = min(SMTP_POOL_SIZE, len(emails))
+    outcomes = await asyncio.gather(*(
+        loop.run_in_executor(_executor, _send_batch_sync, emails[i::sessions])
+        for i in range(sessions)
+    ), return_exceptions=True)
+    for i, outcome in enumerate(outcomes):
+        # Exceção da sessão inteira (pool sem configuração, conexão recusada)
+        # vale para todos os e-mails dela
+        for position, index in enumerate(range(i, len(emails), sessions)):
+            results[index] = outcome if isinstance(outcome, Exception) else outcome[position]
+    return results
+
+
+def smtp_stats() -> dict:
+    return {**_pool.stats, "pool_size": _pool.size} if _pool else {"pool_size": SMTP_POOL_SIZE}
+
+
 def build_reset_email(nome: str, codigo: str) -> str:
     """Monta o HTML do e-mail de recuperação de senha."""
     return f"""
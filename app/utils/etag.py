@@ -0,0 +1,75 @@
+"""
+ETag e GET condicional para as telas que o app consulta ao abrir.
+
+O ETag vem do data_version do usuário (user_stats), que sobe em toda escrita
+de projeto, anotação ou aporte, combinado com a rota, os parâmetros e o
+Accept — representações diferentes têm ETags diferentes. Com If-None-Match
+igual, a rota devolve 304 depois de um find_one pelo _id, antes de varrer a
+coleção ou serializar qualquer coisa.
+
+Usuário sem documento em user_stats ainda não tem versão: a resposta sai
+sem ETag até o primeiro /stats/summary reconstruí-lo.
+"""
+
+import hashlib
+from typing import Optional, Tuple
+
+from fastapi import Request, Response, status
+
+from app.database import get_user_stats_collection
+
+CACHE_CONTROL = "private, no-cache"    # o app sempre revalida
+
+
+async def data_version(user_id: str) -> Optional[int]:
+    col = await get_user_stats_collection()
+    doc = await col.find_one({"_id": user_id}, {"data_version": 1})
+    return doc.get("data_version", 0) if doc else None
+
+
+def make_etag(request: Request, user_id: str, version: int) -> str:
+    key = "|".join((
+        user_id, str(version), request.url.path,
+        str(sorted(request.query_params.multi_items())),
+        request.headers.get("accept", ""),
+    ))
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparação fraca (RFC 7232): ignora o prefixo W/
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+async def check(request: Request, user_id: str,
+                version: Optional[int] = None) -> Tuple[Optional[str], Optional[Response]]:
+    """
+    (etag, resposta 304 ou None). `version` evita a leitura quando a rota já
+    tem o documento de user_stats em mãos.
+    """
+    if version is None:
+        version = await data_version(user_id)
+        if version is None:
+            return None, None
+    etag = make_etag(request, user_id, version)
+    return etag, not_modified(etag) if matches(request, etag) else None
+
+
+def tag(response: Response, etag: Optional[str]) -> Response:
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
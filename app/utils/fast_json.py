@@ -0,0 +1,88 @@
+"""
+Caminho rápido de serialização para as rotas de leitura.
+
+Documentos lidos do banco já têm o formato certo: construir ProjectDB(**doc),
+deixar o FastAPI validar de novo contra o response_model e passar tudo pelo
+jsonable_encoder antes do json.dumps gasta CPU à toa nas listagens.
+
+to_public() monta o dict de saída direto do documento, com os campos e
+defaults do modelo (sem validação), e FastJSONResponse codifica com orjson
+(ObjectId → str, datetime → ISO 8601, como o Pydantic). Sem orjson instalado,
+cai no json da biblioteca padrão. A rota mantém o response_model, então o
+schema do OpenAPI não muda.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, List, Tuple, Type
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:    # dependência opcional
+    orjson = None
+    import json
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ── Documento → formato do modelo ─────────────────────────────────────────────
+# (nome, é float, default) por campo, calculado uma vez por modelo
+
+_layouts: Dict[Type[BaseModel], List[Tuple[str, bool, Any]]] = {}
+
+
+def _layout(model: Type[BaseModel]) -> List[Tuple[str, bool, Any]]:
+    layout = _layouts.get(model)
+    if layout is None:
+        layout = [
+            (name, field.type_ is float, field)
+            for name, field in model.__fields__.items()
+        ]
+        _layouts[model] = layout
+    return layout
+
+
+def to_public(doc: dict, model: Type[BaseModel]) -> dict:
+    """
+    Campos do modelo tirados do documento, sem validação (dados confiáveis do
+    banco). id vem de _id; campos ausentes recebem o default do modelo;
+    inteiros em campos float viram float (o app Flutter lê como double).
+    """
+    out = {}
+    for name, is_float, field in _layout(model):
+        if name == "id" and "id" not in doc:
+            value = str(doc["_id"])
+        elif name in doc:
+            value = doc[name]
+        else:
+            value = field.get_default()
+        if is_float and type(value) is int:
+            value = float(value)
+        out[name] = value
+    return out
@@ -0,0 +1,256 @@
+"""
+Chaves de idempotência (coleção idempotency_keys).
+
+O cliente gera uma chave por operação e a reenvia igual quando repete a
+chamada (app offline, timeout). O servidor guarda o resultado da primeira
+execução e devolve o mesmo nas repetições, sem aplicar de novo.
+
+  _id = "<user_id>:<escopo>:<chave>"   escopo separa POST /batch de outros usos
+
+  pending   reivindicada por uma execução em andamento
+  done      resultado gravado
+  O TTL apaga as duas depois de IDEMPOTENCY_TTL_HOURS.
+
+A reivindicação é um insert com _id único: duas execuções simultâneas com a
+mesma chave nunca aplicam as duas. Uma chave pending nunca é assumida por
+outra execução — não há como saber se a primeira chegou a aplicar. Ela só
+volta a ficar livre por release() (a execução falhou antes de gravar) ou
+pelo TTL. Se o resultado não puder ser gravado depois de aplicado,
+complete() tenta de novo com backoff e, esgotadas as tentativas, a chave
+fica pending: as repetições recebem "em andamento", nunca uma segunda
+aplicação.
+
+run_once() atende as rotas de uma chave por requisição (header
+Idempotency-Key): na frente da coleção fica um LRU em processo, e pedidos
+repetidos que chegam enquanto o primeiro ainda roda no mesmo worker esperam
+por ele em vez de consultar o banco. Em outro worker, a espera é pela
+coleção, até IDEMPOTENCY_WAIT_SECONDS.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.database import get_idempotency_keys_collection
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS     = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_SIZE    = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_WAIT_SECONDS  = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+_POLL_SECONDS             = 0.2
+
+_DUPLICATE_KEY = 11000
+
+_COMPLETE_ATTEMPTS = 4
+_COMPLETE_BACKOFF  = 0.2    # segundos; dobra a cada tentativa
+
+
+def _doc_id(user_id: str, scope: str, key: str) -> str:
+    return f"{user_id}:{scope}:{key}"
+
+
+async def claim(user_id: str, scope: str,
+                keys: List[str]) -> Tuple[Set[str], Dict[str, Any], Set[str]]:
+    """
+    Reivindica as chaves de uma vez. Devolve (reivindicadas, resultados já
+    gravados por chave, em andamento em outra execução).
+    """
+    collection = await get_idempotency_keys_collection()
+    now = datetime.utcnow()
+    ids = {_doc_id(user_id, scope, key): key for key in keys}
+
+    done: Dict[str, Any] = {}
+    busy: Set[str] = set()
+    async for doc in collection.find({"_id": {"$in": list(ids)}}):
+        key = ids[doc["_id"]]
+        if doc["status"] == "done":
+            done[key] = doc["result"]
+        else:
+            busy.add(key)
+
+    expires_at = now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    claimed: Set[str] = set()
+
+    fresh = [doc_id for doc_id, key in ids.items() if key not in done and key not in busy]
+    if fresh:
+        try:
+            await collection.insert_many([
+                {
+                    "_id":        doc_id,
+                    "user_id":    user_id,
+                    "status":     "pending",
+                    "created_at": now,
+                    "expires_at": expires_at,
+                }
+                for doc_id in fresh
+            ], ordered=False)
+            claimed.update(ids[doc_id] for doc_id in fresh)
+        except BulkWriteError as e:
+            # Chave duplicada: outra execução reivindicou entre o find e o insert
+            lost = {fresh[err["index"]] for err in e.details.get("writeErrors", [])
+                    if err.get("code") == _DUPLICATE_KEY}
+            if len(lost) != len(e.details.get("writeErrors", [])):
+                raise
+            claimed.update(ids[doc_id] for doc_id in fresh if doc_id not in lost)
+            busy.update(ids[doc_id] for doc_id in lost)
+    return claimed, done, busy
+
+
+async def complete(user_id: str, scope: str, results: Dict[str, Any]) -> None:
+    """
+    Grava o resultado final das chaves reivindicadas, com backoff. Se todas
+    as tentativas falharem, levanta o último erro; as chaves ficam pending.
+    """
+    if not results:
+        return
+    collection = await get_idempotency_keys_collection()
+    for attempt in range(_COMPLETE_ATTEMPTS):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+        try:
+            await collection.bulk_write([
+                UpdateOne(
+                    {"_id": _doc_id(user_id, scope, key)},
+                    {"$set": {"status": "done", "result": result,
+                              "completed_at": now, "expires_at": expires_at}},
+                )
+                for key, result in results.items()
+            ], ordered=False)
+            return
+        except PyMongoError as e:
+            if attempt == _COMPLETE_ATTEMPTS - 1:
+                raise
+            logger.warning(f"Erro ao gravar resultado de idempotência (tentativa {attempt + 1}): {e}")
+            await asyncio.sleep(_COMPLETE_BACKOFF * 2 ** attempt)
+
+
+async def release(user_id: str, scope: str, keys: Iterable[str]) -> None:
+    """Devolve chaves cuja execução falhou sem resultado: a repetição aplica."""
+    ids = [_doc_id(user_id, scope, key) for key in keys]
+    if not ids:
+        return
+    collection = await get_idempotency_keys_collection()
+    try:
+        await collection.delete_many({"_id": {"$in": ids}, "status": "pending"})
+    except Exception as e:
+        # O TTL libera a chave; só atrasa a repetição
+        logger.error(f"Erro ao liberar chaves de idempotência: {e}")
+
+
+# ── Uma chave por requisição (header Idempotency-Key) ────────────────────────
+
+class KeyReused(Exception):
+    """Mesma chave com outro pedido (fingerprint diferente)."""
+
+
+class KeyBusy(Exception):
+    """A execução com esta chave ainda não terminou em outro worker."""
+
+
+_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_in_flight: Dict[str, "asyncio.Future[Optional[dict]]"] = {}
+_counters: Dict[str, int] = {"executed": 0, "cache_hits": 0, "store_hits": 0, "waits": 0}
+
+
+def _cached(doc_id: str) -> Optional[dict]:
+    cached = _cache.get(doc_id)
+    if cached and time.monotonic() < cached[0]:
+        _cache.move_to_end(doc_id)
+        return cached[1]
+    if cached:
+        del _cache[doc_id]
+    return None
+
+
+def _remember(doc_id: str, entry: dict) -> None:
+    if IDEMPOTENCY_CACHE_SIZE <= 0:
+        return
+    _cache[doc_id] = (time.monotonic() + IDEMPOTENCY_TTL_HOURS * 3600, entry)
+    _cache.move_to_end(doc_id)
+    while len(_cache) > IDEMPOTENCY_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _response(entry: dict, fingerprint: str) -> Any:
+    if entry["fingerprint"] != fingerprint:
+        raise KeyReused()
+    return entry["response"]
+
+
+async def _execute(user_id: str, scope: str, key: str, fingerprint: str,
+                   func: Callable[[], Awaitable[Any]]) -> Tuple[dict, bool]:
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claimed, done, _ = await claim(user_id, scope, [key])
+        if key in done:
+            _counters["store_hits"] += 1
+            return done[key], True
+        if key in claimed:
+            break
+        # Em andamento em outro worker: espera o resultado aparecer
+        if time.monotonic() >= deadline:
+            raise KeyBusy()
+        await asyncio.sleep(_POLL_SECONDS)
+
+    try:
+        response = await func()
+    except Exception:
+        await release(user_id, scope, [key])
+        raise
+    _counters["executed"] += 1
+
+    entry = {"fingerprint": fingerprint, "response": response}
+    try:
+        await complete(user_id, scope, {key: entry})
+    except PyMongoError as e:
+        # Aplicado e sem resultado gravado: a chave fica pending (as
+        # repetições de outros workers recebem 409); neste worker o LRU
+        # ainda devolve o resultado
+        logger.error(f"❌ Erro ao gravar resultado de idempotência: {e}")
+    return entry, False
+
+
+async def run_once(user_id: str, scope: str, key: str, fingerprint: str,
+                   func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """
+    Executa func() uma vez por chave e devolve (resposta, replayed). A
+    resposta precisa ser gravável no MongoDB (dict). fingerprint resume o
+    pedido: a mesma chave com outro pedido levanta KeyReused.
+    """
+    doc_id = _doc_id(user_id, scope, key)
+    while True:
+        entry = _cached(doc_id)
+        if entry is not None:
+            _counters["cache_hits"] += 1
+            return _response(entry, fingerprint), True
+        pending = _in_flight.get(doc_id)
+        if pending is None:
+            break
+        _counters["waits"] += 1
+        entry = await asyncio.shield(pending)
+        if entry is not None:
+            return _response(entry, fingerprint), True
+        # A execução em andamento falhou e liberou a chave: tenta de novo
+
+    future: "asyncio.Future[Optional[dict]]" = asyncio.get_running_loop().create_future()
+    _in_flight[doc_id] = future
+    entry = None
+    try:
+        entry, replayed = await _execute(user_id, scope, key, fingerprint, func)
+        _remember(doc_id, entry)
+    finally:
+        del _in_flight[doc_id]
+        future.set_result(entry)
+    return _response(entry, fingerprint), replayed
+
+
+def stats() -> dict:
+    return {**_counters, "cache_size": len(_cache), "in_flight": len(_in_flight)}
@@ -0,0 +1,224 @@
+"""
+Registro declarativo dos índices do MongoDB.
+
+INDEXES lista, por coleção, os índices que as rotas esperam encontrar.
+ensure_indexes() é chamado no init_db() e cria o que faltar (create_indexes
+é idempotente); index_drift() compara o registro com o que existe no banco.
+
+CANONICAL_QUERIES guarda a forma das consultas quentes de cada rota, usada
+pelo scripts/check_indexes.py para rodar explain() e acusar COLLSCAN.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    keys: Sequence[Tuple[str, int]]
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None   # índice TTL
+    partial_filter: Optional[dict] = None
+
+    def model(self) -> IndexModel:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter:
+            options["partialFilterExpression"] = self.partial_filter
+        return IndexModel(list(self.keys), **options)
+
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    # login, register, forgot/verify/reset password
+    "users": [
+        IndexSpec("email_unique", [("email", ASCENDING)], unique=True),
+    ],
+    # list_user_projects (ordenado por criação) e o pipeline de estatísticas;
+    # user_updated serve o GET /sync
+    "projects": [
+        IndexSpec("user_created", [
+            ("user_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING),
+        ]),
+        IndexSpec("user_updated", [("user_id", ASCENDING), ("updated_at", ASCENDING)]),
+    ],
+    # list_notes com e sem filtro de projeto, o pipeline de estatísticas e
+    # o GET /sync
+    "notes": [
+        IndexSpec("user_created", [
+            ("user_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING),
+        ]),
+        IndexSpec("user_project_created", [
+            ("user_id", ASCENDING), ("project_id", ASCENDING),
+            ("created_at", ASCENDING), ("_id", ASCENDING),
+        ]),
+        IndexSpec("user_max_amount", [
+            ("user_id", ASCENDING), ("max_amount", DESCENDING),
+        ]),
+        IndexSpec("user_updated", [("user_id", ASCENDING), ("updated_at", ASCENDING)]),
+    ],
+    # GET /projects/{id}/transactions (buckets em ordem de tempo) e o upsert
+    # do aporte, que procura o bucket do mês ainda com espaço; user_updated
+    # acha os buckets que receberam aportes desde o último GET /sync
+    "project_transactions": [
+        IndexSpec("project_month", [
+            ("project_id", ASCENDING), ("month", ASCENDING), ("_id", ASCENDING),
+        ]),
+        IndexSpec("user_updated", [("user_id", ASCENDING), ("updated_at", ASCENDING)]),
+    ],
+    # revoked_tokens: _id = jti. O TTL apaga a revogação quando o token
+    # expiraria de qualquer forma; revoked_at alimenta o sync incremental
+    "revoked_tokens": [
+        IndexSpec("expires_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0),
+        IndexSpec("revoked_at", [("revoked_at", ASCENDING)]),
+    ],
+    # rate_limits (RATE_LIMIT_BACKEND=mongo): _id = chave do bucket; buckets
+    # parados somem pelo TTL
+    "rate_limits": [
+        IndexSpec("expires_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0),
+    ],
+    # email_outbox: claim do despachante (pendentes vencidos e leases
+    # expirados); jobs finalizados somem pelo TTL
+    "email_outbox": [
+        IndexSpec("status_next_attempt", [("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexSpec("status_lease", [("status", ASCENDING), ("lease_until", ASCENDING)]),
+        IndexSpec("expires_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0),
+    ],
+    # password_reset_codes: um código ativo por e-mail; o TTL apaga os
+    # expirados
+    "password_reset_codes": [
+        IndexSpec("email_unique", [("email", ASCENDING)], unique=True),
+        IndexSpec("expires_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0),
+    ],
+    # sync_tombstones: exclusões de projetos e anotações para o GET /sync;
+    # somem pelo TTL depois de SYNC_TOMBSTONE_DAYS
+    "sync_tombstones": [
+        IndexSpec("user_deleted", [("user_id", ASCENDING), ("deleted_at", ASCENDING)]),
+        IndexSpec("expires_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0),
+    ],
+    # idempotency_keys: _id = user:escopo:chave. O TTL apaga resultados
+    # antigos e reivindicações abandonadas (lease vencido)
+    "idempotency_keys": [
+        IndexSpec("expires_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0),
+    ],
+    # user_stats e category_rules usam _id = user_id (índice padrão)
+}
+
+
+# Forma das consultas de cada rota: (coleção, filtro, ordenação)
+_SAMPLE_ID = "000000000000000000000000"
+_SAMPLE_TIME = datetime(2024, 1, 1)
+
+CANONICAL_QUERIES: Dict[str, Tuple[str, dict, Optional[List[Tuple[str, int]]]]] = {
+    "POST /auth/login":           ("users", {"email": "user@example.com"}, None),
+    "POST /users/register":       ("users", {"email": "user@example.com"}, None),
+    "POST /auth/forgot-password": ("users", {"email": "user@example.com"}, None),
+    "POST /auth/verify-code":     ("password_reset_codes", {"email": "user@example.com"}, None),
+    "GET /projects/": (
+        "projects", {"user_id": _SAMPLE_ID}, [("created_at", ASCENDING), ("_id", ASCENDING)],
+    ),
+    "GET /notes/": (
+        "notes", {"user_id": _SAMPLE_ID}, [("created_at", ASCENDING), ("_id", ASCENDING)],
+    ),
+    "GET /notes/?project_id": (
+        "notes", {"user_id": _SAMPLE_ID, "project_id": _SAMPLE_ID},
+        [("created_at", ASCENDING), ("_id", ASCENDING)],
+    ),
+    "GET /stats/summary (notas)": (
+        "notes", {"user_id": _SAMPLE_ID, "max_amount": {"$gt": 0}}, None,
+    ),
+    "GET /stats/summary (projetos)": ("projects", {"user_id": _SAMPLE_ID}, None),
+    "GET /projects/{id}/transactions": (
+        "project_transactions", {"project_id": _SAMPLE_ID},
+        [("month", ASCENDING), ("_id", ASCENDING)],
+    ),
+    "GET /sync (projetos)": (
+        "projects", {"user_id": _SAMPLE_ID, "updated_at": {"$gte": _SAMPLE_TIME}}, None,
+    ),
+    "GET /sync (notas)": (
+        "notes", {"user_id": _SAMPLE_ID, "updated_at": {"$gte": _SAMPLE_TIME}}, None,
+    ),
+    "GET /sync (aportes)": (
+        "project_transactions", {"user_id": _SAMPLE_ID, "updated_at": {"$gte": _SAMPLE_TIME}}, None,
+    ),
+    "GET /sync (exclusões)": (
+        "sync_tombstones", {"user_id": _SAMPLE_ID, "deleted_at": {"$gte": _SAMPLE_TIME}}, None,
+    ),
+}
+
+
+async def ensure_indexes(db) -> None:
+    """Cria os índices registrados. Falhas são logadas, não derrubam a API."""
+    for collection_name, specs in INDEXES.items():
+        try:
+            await db[collection_name].create_indexes([spec.model() for spec in specs])
+        except PyMongoError as e:
+            # Ex.: e-mails duplicados impedem o índice único
+            logger.error(f"❌ Erro ao criar índices de {collection_name}: {e}")
+    logger.info("✅ Índices verificados")
+
+
+def _same(spec: IndexSpec, info: dict) -> bool:
+    return (
+        [tuple(k) for k in info["key"]] == [tuple(k) for k in spec.keys]
+        and bool(info.get("unique")) == spec.unique
+        and info.get("expireAfterSeconds") == spec.expire_after_seconds
+        and info.get("partialFilterExpression") == spec.partial_filter
+    )
+
+
+async def index_drift(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Diferenças entre o registro e o banco, por coleção:
+      missing   registrados e ausentes
+      changed   mesmo nome, chaves ou opções diferentes
+      extra     presentes no banco e fora do registro
+    Coleções sem diferença não aparecem no resultado.
+    """
+    drift: Dict[str, Dict[str, List[str]]] = {}
+    for collection_name, specs in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        existing.pop("_id_", None)
+        registered = {spec.name: spec for spec in specs}
+
+        report = {
+            "missing": [name for name in registered if name not in existing],
+            "changed": [
+                name for name, spec in registered.items()
+                if name in existing and not _same(spec, existing[name])
+            ],
+            "extra":   [name for name in existing if name not in registered],
+        }
+        if any(report.values()):
+            drift[collection_name] = report
+    return drift
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def explain_canonical_queries(db) -> Dict[str, List[str]]:
+    """Roda explain() em cada consulta canônica e devolve os estágios do plano."""
+    plans = {}
+    for route, (collection_name, query, sort) in CANONICAL_QUERIES.items():
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning = explain["queryPlanner"]["winningPlan"]
+        plans[route] = [stage for stage in _stages(winning) if stage]
+    return plans
@@ -0,0 +1,86 @@
+"""
+Carregamento por _id com coalescência de requisições (estilo DataLoader).
+
+Buscas por _id feitas no mesmo tick do event loop são agrupadas: os ids são
+deduplicados, cada coleção recebe um único find({"_id": {"$in": [...]}}) e
+o resultado é distribuído para as corrotinas que esperavam. Sob rajadas
+(várias requisições autenticadas ao mesmo tempo) N find_one viram 1 consulta.
+
+O loader não filtra por dono: quem chama confere user_id no documento
+devolvido, como faria o filtro do find_one.
+"""
+
+import asyncio
+import copy
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+from app.database import get_notes_collection, get_users_collection
+
+logger = logging.getLogger(__name__)
+
+# Limite de ids por consulta $in
+MAX_BATCH_SIZE = 1000
+
+_counters: Dict[str, int] = {"loads": 0, "queries": 0}
+
+
+class BatchLoader:
+    def __init__(self, get_collection: Callable[[], Awaitable], projection: Optional[dict] = None):
+        self._get_collection = get_collection
+        self._projection = projection
+        self._pending: Dict[ObjectId, List[asyncio.Future]] = {}
+
+    async def load(self, oid: ObjectId) -> Optional[dict]:
+        """Documento com esse _id, ou None. Cada chamador recebe sua cópia."""
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            # Roda depois das corrotinas já prontas neste tick
+            loop.call_soon(self._dispatch)
+        future = loop.create_future()
+        self._pending.setdefault(oid, []).append(future)
+        _counters["loads"] += 1
+        return await future
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        ids = list(pending)
+        for start in range(0, len(ids), MAX_BATCH_SIZE):
+            batch = {oid: pending[oid] for oid in ids[start:start + MAX_BATCH_SIZE]}
+            asyncio.ensure_future(self._fetch(batch))
+
+    async def _fetch(self, batch: Dict[ObjectId, List[asyncio.Future]]) -> None:
+        try:
+            collection = await self._get_collection()
+            _counters["queries"] += 1
+            docs = {
+                doc["_id"]: doc
+                async for doc in collection.find({"_id": {"$in": list(batch)}}, self._projection)
+            }
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for oid, futures in batch.items():
+            doc = docs.get(oid)
+            for position, future in enumerate(futures):
+                if future.done():      # chamador cancelado
+                    continue
+                # As rotas alteram o dict recebido; ids repetidos ganham cópias
+                future.set_result(doc if doc is None or position == 0 else copy.deepcopy(doc))
+
+
+users = BatchLoader(get_users_collection)
+notes = BatchLoader(get_notes_collection)
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "avg_batch": round(_counters["loads"] / _counters["queries"], 2) if _counters["queries"] else 0.0,
+    }
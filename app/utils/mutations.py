@@ -0,0 +1,319 @@
+"""
+Mutações em lote da fila offline do app (POST /batch).
+
+O app acumula criações, edições e exclusões de notas e projetos enquanto está
+offline e as reenvia numa chamada só. Cada operação traz uma chave de
+idempotência (ver app/utils/idempotency.py): repetições devolvem o resultado
+gravado da primeira execução.
+
+Fluxo:
+  1. valida cada operação com o modelo da rota equivalente (erro → 422 só
+     naquela operação)
+  2. reivindica as chaves de uma vez
+  3. busca com um $in por coleção o estado atual dos ids editados/excluídos
+  4. percorre as operações em ordem, sobre esse estado em memória, montando
+     os InsertOne/UpdateOne/DeleteOne e o antes/depois de cada documento
+     (várias operações no mesmo id enxergam as anteriores)
+  5. um bulk_write ordenado por coleção
+  6. efeitos colaterais das aplicadas: user_stats, projects_count, buckets
+     de aportes e tombstones do /sync — agrupados onde dá
+  7. grava os resultados das chaves
+
+Chave de operação que com certeza não foi aplicada (validação do banco,
+ou posterior a ela num bulk_write ordenado) é liberada para a repetição.
+Operação aplicada — ou com resultado incerto, como um erro de rede no meio do
+bulk_write — mantém a chave: a repetição recebe o resultado ou 409, nunca
+uma segunda aplicação (ver app/utils/idempotency.py).
+
+Os efeitos colaterais são os mesmos das rotas de notas e projetos.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.database import get_notes_collection, get_projects_collection, get_users_collection
+from app.models.batch import BatchOperation, BatchOperationResult
+from app.models.note import NoteCreate, NoteDB, NoteUpdate
+from app.models.project import ProjectCreate, ProjectDB, ProjectUpdate
+from app.utils import idempotency, user_cache
+from app.utils.classifier import get_classifier
+from app.utils.deposits import calculate_progress
+from app.utils.fast_json import to_public
+from app.utils.note_parser import extract_note_fields
+from app.utils.sync import record_deletion
+from app.utils.transactions_store import RECENT_TRANSACTIONS, delete_project_transactions
+from app.utils.user_stats import record_note, record_project
+
+logger = logging.getLogger(__name__)
+
+SCOPE = "batch"
+
+_MODELS = {
+    ("note", "create"):    NoteCreate,
+    ("note", "update"):    NoteUpdate,
+    ("project", "create"): ProjectCreate,
+    ("project", "update"): ProjectUpdate,
+}
+
+_OUTPUT = {"note": NoteDB, "project": ProjectDB}
+
+_NOT_FOUND = {"note": "Nota não encontrada", "project": "Projeto não encontrado"}
+
+
+def _validate(op: BatchOperation) -> Tuple[Optional[dict], Optional[str]]:
+    """(dados validados, erro). Mesmas regras do corpo da rota equivalente."""
+    if op.action != "create":
+        if not op.id or not ObjectId.is_valid(op.id):
+            return None, "id inválido"
+    model = _MODELS.get((op.entity, op.action))
+    if model is None:
+        return {}, None
+    try:
+        parsed = model.parse_obj(op.data)
+    except ValidationError as e:
+        return None, str(e)
+    return parsed.dict(exclude_unset=op.action == "update"), None
+
+
+async def _current_state(user_id: str, ops: List[BatchOperation]) -> Dict[Tuple[str, str], Optional[dict]]:
+    """Documentos atuais dos ids editados/excluídos: um $in por coleção."""
+    state: Dict[Tuple[str, str], Optional[dict]] = {}
+    for entity, get_collection, projection in (
+        ("note",    get_notes_collection,    None),
+        ("project", get_projects_collection, {"transactions": {"$slice": -RECENT_TRANSACTIONS}}),
+    ):
+        ids = {op.id for op in ops if op.entity == entity and op.action != "create"}
+        if not ids:
+            continue
+        collection = await get_collection()
+        async for doc in collection.find(
+            {"_id": {"$in": [ObjectId(i) for i in ids]}, "user_id": user_id}, projection
+        ):
+            state[(entity, str(doc["_id"]))] = doc
+    return state
+
+
+# ── Montagem das escritas ─────────────────────────────────────────────────────
+
+def _plan_note(user_id: str, op: BatchOperation, data: dict, before: Optional[dict],
+               classifier) -> Tuple[object, Optional[dict]]:
+    now = datetime.utcnow()
+    if op.action == "create":
+        doc = {
+            **data,
+            "_id":        ObjectId(),
+            "user_id":    user_id,
+            "project_id": op.project_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+        doc.update(extract_note_fields(doc["title"], doc["content"], classifier))
+        return InsertOne(dict(doc)), doc
+
+    query = {"_id": before["_id"], "user_id": user_id}
+    if op.action == "delete":
+        return DeleteOne(query), None
+
+    changes = {**data, "updated_at": now}
+    if "title" in changes or "content" in changes:
+        changes.update(extract_note_fields(
+            changes.get("title",   before.get("title")),
+            changes.get("content", before.get("content")),
+            classifier,
+        ))
+    return UpdateOne(query, {"$set": changes}), {**before, **changes}
+
+
+def _plan_project(user_id: str, op: BatchOperation, data: dict,
+                  before: Optional[dict]) -> Tuple[object, Optional[dict]]:
+    now = datetime.utcnow()
+    if op.action == "create":
+        doc = {
+            **data,
+            "_id":          ObjectId(),
+            "user_id":      user_id,
+            "created_at":   now,
+            "updated_at":   now,
+            "progress":     calculate_progress(data["applied_value"], data["required_value"]),
+            "transactions": [],
+            "transactions_count": 0,
+        }
+        return InsertOne(dict(doc)), doc
+
+    query = {"_id": before["_id"], "user_id": user_id}
+    if op.action == "delete":
+        return DeleteOne(query), None
+
+    changes = {**data, "updated_at": now}
+    changes["progress"] = calculate_progress(
+        changes.get("applied_value",  before.get("applied_value",  0.0)),
+        changes.get("required_value", before.get("required_value", 0.0)),
+    )
+    return UpdateOne(query, {"$set": changes}), {**before, **changes}
+
+
+# ── Execução ──────────────────────────────────────────────────────────────────
+
+async def _write(entity: str, planned: List[dict]) -> Tuple[List[dict], Dict[int, str], bool]:
+    """
+    bulk_write ordenado de uma coleção. Devolve (aplicadas, erro por índice,
+    certo): certo=False quando não dá para saber o que foi aplicado.
+    """
+    if not planned:
+        return [], {}, True
+    get_collection = get_notes_collection if entity == "note" else get_projects_collection
+    collection = await get_collection()
+    try:
+        await collection.bulk_write([p["write"] for p in planned], ordered=True)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        first = errors[0]["index"] if errors else 0
+        failed = {planned[first]["index"]: errors[0].get("errmsg") if errors else str(e)}
+        for p in planned[first + 1:]:
+            failed[p["index"]] = "Não aplicada: operação anterior do lote falhou"
+        return planned[:first], failed, bool(errors)
+    except PyMongoError as e:
+        logger.error(f"❌ Erro no bulk_write de {entity} do lote: {e}")
+        return [], {p["index"]: "Erro ao gravar a operação" for p in planned}, False
+    return planned, {}, True
+
+
+async def _side_effects(user_id: str, applied: List[dict]) -> None:
+    """Os mesmos efeitos das rotas individuais, agrupados por tipo."""
+    for p in applied:
+        record = record_note if p["entity"] == "note" else record_project
+        await record(user_id, p["before"], p["after"])
+
+    deleted: Dict[str, List[str]] = {"note": [], "project": []}
+    count = Counter()
+    for p in applied:
+        if p["action"] == "delete":
+            deleted[p["entity"]].append(p["id"])
+        if p["entity"] == "project" and p["action"] != "update":
+            count["projects"] += 1 if p["action"] == "create" else -1
+
+    if deleted["project"]:
+        await delete_project_transactions(*deleted["project"])
+    if count["projects"]:
+        users_collection = await get_users_collection()
+        await users_collection.update_one(
+            {"_id": ObjectId(user_id)}, {"$inc": {"projects_count": count["projects"]}}
+        )
+    if any(p["entity"] == "project" and p["action"] != "update" for p in applied):
+        user_cache.invalidate(user_id)
+    for entity, ids in deleted.items():
+        await record_deletion(user_id, entity, ids)
+
+
+def _outcome(p: dict) -> dict:
+    """Resultado gravado na chave e devolvido ao cliente (sem index/replayed)."""
+    if p["action"] == "delete":
+        return {"status": 204, "id": p["id"], "data": None, "error": None}
+    return {
+        "status": 201 if p["action"] == "create" else 200,
+        "id":     p["id"],
+        "data":   to_public(p["after"], _OUTPUT[p["entity"]]),
+        "error":  None,
+    }
+
+
+async def apply_batch(user_id: str, ops: List[BatchOperation]) -> List[BatchOperationResult]:
+    results: List[Optional[BatchOperationResult]] = [None] * len(ops)
+
+    def finish(i: int, status: int, **fields) -> None:
+        results[i] = BatchOperationResult(
+            index=i, idempotency_key=ops[i].idempotency_key, status=status, **fields
+        )
+
+    valid: Dict[int, dict] = {}
+    for i, op in enumerate(ops):
+        data, error = _validate(op)
+        if error:
+            finish(i, 422, id=op.id, error=error)
+        else:
+            valid[i] = data
+
+    claimed, done, busy = await idempotency.claim(
+        user_id, SCOPE, [ops[i].idempotency_key for i in valid]
+    )
+    runnable = []
+    for i in valid:
+        key = ops[i].idempotency_key
+        if key in done:
+            results[i] = BatchOperationResult(
+                index=i, idempotency_key=key, replayed=True, **done[key]
+            )
+        elif key in busy:
+            finish(i, 409, id=ops[i].id, error="Operação com esta chave ainda em andamento")
+        else:
+            runnable.append(i)
+
+    stored: Dict[str, dict] = {}
+    failed_keys: List[str] = []      # com certeza não aplicadas: liberadas
+    attempted: Set[str] = set()      # foram para um bulk_write
+    try:
+        state = await _current_state(user_id, [ops[i] for i in runnable])
+        classifier = None
+        if any(ops[i].entity == "note" and ops[i].action != "delete" for i in runnable):
+            classifier = await get_classifier(user_id)
+
+        planned: Dict[str, List[dict]] = {"note": [], "project": []}
+        for i in runnable:
+            op = ops[i]
+            before = state.get((op.entity, op.id)) if op.action != "create" else None
+            if op.action != "create" and before is None:
+                finish(i, 404, id=op.id, error=_NOT_FOUND[op.entity])
+                stored[op.idempotency_key] = results[i].dict(include={"status", "id", "data", "error"})
+                continue
+            if op.entity == "note":
+                write, after = _plan_note(user_id, op, valid[i], before, classifier)
+            else:
+                write, after = _plan_project(user_id, op, valid[i], before)
+            entity_id = str(after["_id"]) if op.action == "create" else op.id
+            state[(op.entity, entity_id)] = after
+            planned[op.entity].append({
+                "index": i, "entity": op.entity, "action": op.action, "id": entity_id,
+                "write": write, "before": before, "after": after,
+            })
+
+        applied: List[dict] = []
+        for entity, items in planned.items():
+            attempted.update(ops[p["index"]].idempotency_key for p in items)
+            ok, failed, certain = await _write(entity, items)
+            # Resultado guardado logo após a escrita, antes dos efeitos colaterais
+            for p in ok:
+                outcome = _outcome(p)
+                finish(p["index"], **outcome)
+                stored[ops[p["index"]].idempotency_key] = outcome
+            applied += ok
+            for i, error in failed.items():
+                finish(i, 500, id=ops[i].id, error=error)
+                if certain:
+                    failed_keys.append(ops[i].idempotency_key)
+    except Exception:
+        # Só as chaves que nem chegaram ao bulk_write voltam a ficar livres
+        await idempotency.release(user_id, SCOPE, claimed - set(stored) - attempted)
+        raise
+
+    applied.sort(key=lambda p: p["index"])
+    try:
+        await _side_effects(user_id, applied)
+    except Exception as e:
+        # As escritas já valeram: o resultado precisa ser gravado mesmo assim
+        logger.error(f"❌ Erro nos efeitos colaterais do lote: {e}", exc_info=True)
+
+    await idempotency.release(user_id, SCOPE, failed_keys)
+    try:
+        await idempotency.complete(user_id, SCOPE, stored)
+    except PyMongoError as e:
+        # Escritas já aplicadas: as chaves ficam pending e as repetições
+        # recebem 409 em vez de aplicar de novo
+        logger.error(f"❌ Erro ao gravar resultados de idempotência: {e}")
+    return results
@@ -0,0 +1,82 @@
+"""
+Extração de valores monetários e categoria das anotações.
+
+Roda uma única vez, na escrita (create_note/update_note), e o resultado fica
+gravado no próprio documento da nota:
+  extracted_amounts  lista de valores em R$ encontrados no título/conteúdo
+  max_amount         maior valor (0.0 se não houver) — usado nas estatísticas
+  category           categoria detectada pelas palavras-chave (ver classifier.py)
+"""
+
+import logging
+import re
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+from app.database import get_notes_collection
+from app.utils.classifier import CategoryClassifier, default_classifier, get_classifier
+
+logger = logging.getLogger(__name__)
+
+# Regex para valores monetários nas anotações: R$ 43,50 ou R$43.50
+_MONEY_RE = re.compile(r"R\$\s*([\d\.]+(?:,\d{2})?)")
+
+
+def _parse_brl(raw: str) -> float:
+    try:
+        return float(raw.replace(".", "").replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def extract_note_fields(
+    title: Optional[str],
+    content: Optional[str],
+    classifier: CategoryClassifier = default_classifier,
+) -> dict:
+    """Campos derivados gravados junto com a anotação."""
+    text    = (content or "") + " " + (title or "")
+    amounts = [_parse_brl(m) for m in _MONEY_RE.findall(text)]
+    return {
+        "extracted_amounts": amounts,
+        "max_amount":        max(amounts) if amounts else 0.0,
+        "category":          classifier.classify(text),
+    }
+
+
+# ── Migração: preenche notas antigas ──────────────────────────────────────────
+
+async def backfill(
+    batch_size: int = 500,
+    recompute: bool = False,
+    user_id: Optional[str] = None,
+) -> int:
+    """
+    Percorre as notas com um cursor e grava os campos derivados em lotes de
+    bulk_write. Sem `recompute`, só processa notas que ainda não os têm.
+    Retorna quantas notas foram atualizadas.
+    """
+    notes_collection = await get_notes_collection()
+    query = {} if recompute else {"max_amount": {"$exists": False}}
+    if user_id:
+        query["user_id"] = user_id
+    cursor = notes_collection.find(
+        query, {"title": 1, "content": 1, "user_id": 1}
+    ).batch_size(batch_size)
+
+    updated = 0
+    ops: List[UpdateOne] = []
+    async for note in cursor:
+        classifier = await get_classifier(note.get("user_id"))
+        fields = extract_note_fields(note.get("title"), note.get("content"), classifier)
+        ops.append(UpdateOne({"_id": note["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            result = await notes_collection.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+            ops = []
+            logger.info(f"Backfill de notas: {updated} atualizadas até agora")
+    if ops:
+        result = await notes_collection.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+    return updated
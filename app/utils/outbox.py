@@ -0,0 +1,165 @@
+"""
+Fila durável de e-mails (coleção email_outbox) e o despachante em background.
+
+As rotas só chamam enqueue() e respondem na hora; o envio SMTP acontece em
+dispatch_loop(), iniciado no startup de cada worker:
+
+  pending  → sending   claim atômico (find_one_and_update) com lease e
+                       claim_id: dois workers nunca pegam o mesmo job
+  sending  → sent      envio ok
+  sending  → pending   falha: nova tentativa com backoff exponencial
+  sending  → failed    esgotou OUTBOX_MAX_ATTEMPTS
+
+Um job em sending cujo lease venceu (worker morreu no meio) volta a ser
+elegível. Jobs finalizados somem pelo TTL em expires_at.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from app.database import get_email_outbox_collection
+from app.utils.email_service import send_emails
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE        = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS      = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_LEASE_SECONDS     = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_MAX_ATTEMPTS      = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SECONDS   = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "10"))
+OUTBOX_RETENTION_DAYS    = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+_MAX_BACKOFF_SECONDS     = 3600
+
+_wakeup: Optional[asyncio.Event] = None
+_counters = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0}
+
+
+def _event() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+async def enqueue(to_email: str, subject: str, html_body: str) -> ObjectId:
+    collection = await get_email_outbox_collection()
+    now = datetime.utcnow()
+    result = await collection.insert_one({
+        "to":              to_email,
+        "subject":         subject,
+        "html":            html_body,
+        "status":          "pending",
+        "attempts":        0,
+        "next_attempt_at": now,
+        "created_at":      now,
+    })
+    _counters["enqueued"] += 1
+    _event().set()    # acorda o despachante deste worker sem esperar o poll
+    return result.inserted_id
+
+
+def backoff(attempts: int) -> timedelta:
+    """Exponencial com jitter: 10s, 20s, 40s... até 1h."""
+    delay = min(_MAX_BACKOFF_SECONDS, OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+async def claim_batch(limit: int = OUTBOX_BATCH_SIZE) -> List[dict]:
+    collection = await get_email_outbox_collection()
+    jobs = []
+    for _ in range(limit):
+        now = datetime.utcnow()
+        job = await collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "lease_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status":      "sending",
+                    "claim_id":    uuid.uuid4().hex,
+                    "lease_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            break
+        jobs.append(job)
+    return jobs
+
+
+async def _finish(job: dict, error: Optional[Exception]) -> None:
+    collection = await get_email_outbox_collection()
+    now = datetime.utcnow()
+    # claim_id: se o lease venceu e outro worker pegou o job, não sobrescreve
+    query = {"_id": job["_id"], "claim_id": job["claim_id"]}
+    retention = now + timedelta(days=OUTBOX_RETENTION_DAYS)
+
+    if error is None:
+        update = {"$set": {"status": "sent", "sent_at": now, "expires_at": retention},
+                  "$unset": {"lease_until": "", "last_error": ""}}
+        _counters["sent"] += 1
+    elif job["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+        update = {"$set": {"status": "failed", "last_error": str(error), "expires_at": retention},
+                  "$unset": {"lease_until": ""}}
+        _counters["failed"] += 1
+        logger.error(f"❌ E-mail para {job['to']} descartado após {job['attempts']} tentativas: {error}")
+    else:
+        update = {"$set": {"status": "pending", "last_error": str(error),
+                           "next_attempt_at": now + backoff(job["attempts"])},
+                  "$unset": {"lease_until": ""}}
+        _counters["retried"] += 1
+        logger.warning(f"E-mail para {job['to']} falhou (tentativa {job['attempts']}): {error}")
+    await collection.update_one(query, update)
+
+
+async def dispatch_once() -> int:
+    """
+    Reivindica um lote, envia pelas sessões do pool SMTP (várias mensagens
+    por sessão) e grava o status de cada job.
+    """
+    jobs = await claim_batch()
+    if not jobs:
+        return 0
+    errors = await send_emails([(job["to"], job["subject"], job["html"]) for job in jobs])
+    for job, error in zip(jobs, errors):
+        await _finish(job, error)
+    return len(jobs)
+
+
+async def dispatch_loop() -> None:
+    wakeup = _event()
+    while True:
+        wakeup.clear()    # antes do claim: enqueue durante o envio não se perde
+        try:
+            if await dispatch_once() == OUTBOX_BATCH_SIZE:
+                continue    # ainda pode haver fila
+        except PyMongoError as e:
+            logger.error(f"❌ Erro no despachante de e-mails: {e}")
+        except Exception:
+            # Job malformado, executor fechado...: o despachante não pode
+            # morrer (sem ele nenhum e-mail sai deste worker). Espera o poll
+            # inteiro — o wakeup poderia repetir o erro em laço.
+            logger.exception("❌ Erro inesperado no despachante de e-mails")
+            await asyncio.sleep(OUTBOX_POLL_SECONDS)
+            continue
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def stats() -> dict:
+    return dict(_counters)
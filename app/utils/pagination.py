@@ -0,0 +1,70 @@
+"""
+Paginação por cursor (keyset) para as listagens.
+
+A ordem é sempre (created_at, _id) — _id desempata registros criados no
+mesmo instante. O cursor é opaco para o cliente: base64 de um JSON com os
+valores da última linha devolvida, então a próxima página é um range scan
+no índice (user_id, created_at, _id) em vez de skip().
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE     = 200
+
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps({"t": doc["created_at"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+
+def is_paginated(limit: Optional[int], cursor: Optional[str]) -> bool:
+    """Sem limit nem cursor o cliente recebe a lista completa (modo legado)."""
+    return limit is not None or cursor is not None
+
+
+def keyset_query(query: dict, cursor: Optional[str], order: str) -> dict:
+    if not cursor:
+        return query
+    created_at, last_id = decode_cursor(cursor)
+    op = "$gt" if order == "asc" else "$lt"
+    return {
+        **query,
+        "$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "_id": {op: last_id}},
+        ],
+    }
+
+
+def sort_spec(order: str) -> List[Tuple[str, int]]:
+    direction = ASCENDING if order == "asc" else DESCENDING
+    return [("created_at", direction), ("_id", direction)]
+
+
+async def fetch_page(collection, query: dict, limit: Optional[int], cursor: Optional[str],
+                     order: str, projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
+    """Busca uma página e o cursor da próxima (None na última página)."""
+    limit = limit or DEFAULT_PAGE_SIZE
+    docs = await collection.find(
+        keyset_query(query, cursor, order), projection
+    ).sort(sort_spec(order)).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,200 @@
+"""
+Controle de admissão das rotas que rodam bcrypt (login, registro, reset).
+
+Antes de chegar ao hash, cada requisição passa por:
+  - token bucket por IP do cliente
+  - token bucket por e-mail (campo do formulário/JSON)
+  - limite de requisições de senha em andamento (AUTH_MAX_IN_FLIGHT)
+Qualquer recusa vira 429 imediato com Retry-After, sem gastar CPU.
+
+O limite de em andamento é por worker, não por deploy: com N workers do
+gunicorn, até N × AUTH_MAX_IN_FLIGHT hashes rodam ao mesmo tempo.
+
+IP do cliente: por padrão, o endereço da conexão. Atrás de proxy reverso
+(Render), RATE_LIMIT_TRUST_PROXY=true lê o X-Forwarded-For — mas só as
+entradas acrescentadas pelos RATE_LIMIT_PROXY_HOPS proxies confiáveis, da
+direita para a esquerda. O que estiver mais à esquerda veio do cliente e
+pode ser qualquer coisa: usá-lo daria um bucket novo a cada requisição.
+
+O estado dos buckets fica num backend plugável (RATE_LIMIT_BACKEND):
+  memory   dicionário em processo (padrão; cada worker tem o seu)
+  mongo    coleção rate_limits, compartilhada entre os workers do gunicorn
+"""
+
+import logging
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from app.database import get_rate_limits_collection
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND          = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_TRUST_PROXY      = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+RATE_LIMIT_PROXY_HOPS       = max(1, int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1")))
+RATE_LIMIT_IP_PER_MINUTE    = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+RATE_LIMIT_IP_BURST         = float(os.getenv("RATE_LIMIT_IP_BURST", "10"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "5"))
+RATE_LIMIT_EMAIL_BURST      = float(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+AUTH_MAX_IN_FLIGHT          = int(os.getenv("AUTH_MAX_IN_FLIGHT", "32"))
+
+# Buckets parados por mais que isso voltam cheios e podem ser descartados
+_IDLE_SECONDS = 3600
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+# take() consome `cost` fichas do bucket e devolve 0.0 se admitiu, ou quantos
+# segundos faltam para haver fichas suficientes.
+
+class MemoryBackend:
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: Dict[str, Tuple[float, float]] = {}   # key -> (fichas, instante)
+        self._max_keys = max_keys
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            self._prune(now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+    def _prune(self, now: float) -> None:
+        if len(self._buckets) <= self._max_keys:
+            return
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated > _IDLE_SECONDS:
+                del self._buckets[key]
+
+
+class MongoBackend:
+    """Refill e consumo num único update em pipeline — atômico entre workers."""
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        collection = await get_rate_limits_collection()
+        elapsed = {"$divide": [
+            {"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000,
+        ]}
+        doc = await collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": {"$min": [
+                    burst,
+                    {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]},
+                ]}}},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {
+                    "tokens":     {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                    "updated_at": "$$NOW",
+                    "expires_at": {"$add": ["$$NOW", _IDLE_SECONDS * 1000]},
+                }},
+            ],
+            projection={"tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if doc["allowed"] else (cost - doc["tokens"]) / rate
+
+
+_backend = MongoBackend() if RATE_LIMIT_BACKEND == "mongo" else MemoryBackend()
+_fallback = MemoryBackend()
+
+_in_flight = 0
+_counters = {"admitted": 0, "rejected_ip": 0, "rejected_email": 0, "rejected_in_flight": 0}
+
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+
+async def _take(key: str, per_minute: float, burst: float) -> float:
+    try:
+        return await _backend.take(key, per_minute / 60, burst)
+    except PyMongoError as e:
+        # Banco indisponível não pode derrubar o login: limita só no worker
+        logger.warning(f"Rate limit em memória (backend indisponível): {e}")
+        return await _fallback.take(key, per_minute / 60, burst)
+
+
+def _too_many(retry_after: float, reason: str) -> HTTPException:
+    _counters[f"rejected_{reason}"] += 1
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Muitas tentativas. Aguarde antes de tentar novamente.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def client_ip(request: Request) -> str:
+    forwarded = request.headers.get("x-forwarded-for")
+    if RATE_LIMIT_TRUST_PROXY and forwarded:
+        # Cada proxy acrescenta à direita o endereço que viu; o cliente é o
+        # que o proxy confiável mais externo acrescentou
+        hops = [part.strip() for part in forwarded.split(",") if part.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+async def _email_of(request: Request) -> Optional[str]:
+    # O corpo já foi lido pelo FastAPI; form()/json() usam o cache da Request
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            data = await request.json()
+            email = data.get("email") if isinstance(data, dict) else None
+        else:
+            email = (await request.form()).get("username")    # OAuth2PasswordRequestForm
+    except Exception:
+        return None
+    return str(email).strip().lower() if email else None
+
+
+def password_route(scope: str):
+    """
+    Dependência das rotas com bcrypt. Uso:
+        @router.post("/login", dependencies=[Depends(password_route("login"))])
+    """
+    async def admission(request: Request):
+        global _in_flight
+        retry = await _take(f"{scope}:ip:{client_ip(request)}",
+                            RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+        if retry:
+            raise _too_many(retry, "ip")
+
+        email = await _email_of(request)
+        if email:
+            retry = await _take(f"{scope}:email:{email}",
+                                RATE_LIMIT_EMAIL_PER_MINUTE, RATE_LIMIT_EMAIL_BURST)
+            if retry:
+                raise _too_many(retry, "email")
+
+        if _in_flight >= AUTH_MAX_IN_FLIGHT:
+            raise _too_many(1, "in_flight")
+
+        _in_flight += 1
+        _counters["admitted"] += 1
+        try:
+            yield
+        finally:
+            _in_flight -= 1
+
+    return admission
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "in_flight":     _in_flight,
+        "max_in_flight": AUTH_MAX_IN_FLIGHT,
+        "backend":       type(_backend).__name__,
+    }
@@ -0,0 +1,175 @@
+"""
+Revogação de tokens JWT (logout e rotação de refresh tokens).
+
+A fonte da verdade é a coleção revoked_tokens ({_id: jti, user_id,
+expires_at, revoked_at}); o índice TTL em expires_at apaga cada revogação
+quando o token expiraria de qualquer forma.
+
+get_current_user não consulta o banco: cada worker mantém um filtro de Bloom
+(resposta negativa imediata, o caso comum) e o conjunto exato dos jti
+revogados (confirma os positivos, sem falso positivo). sync_loop() traz as
+revogações feitas em outros workers a cada REVOKED_TOKENS_SYNC_SECONDS; no
+worker que revogou o efeito é imediato.
+
+A rotação de refresh tokens não pode depender dessa janela: revoke() é um
+upsert atômico que diz se o jti foi revogado agora ou já estava, e
+is_revoked_in_store() confirma no banco. Cada refresh token carrega a
+família (fam) da sessão; reusar um token já rotacionado revoga a família
+inteira (_id = "family:<fam>").
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.database import get_revoked_tokens_collection
+
+logger = logging.getLogger(__name__)
+
+REVOKED_TOKENS_SYNC_SECONDS   = float(os.getenv("REVOKED_TOKENS_SYNC_SECONDS", "10"))
+REVOKED_TOKENS_BLOOM_CAPACITY = int(os.getenv("REVOKED_TOKENS_BLOOM_CAPACITY", "100000"))
+_BLOOM_FALSE_POSITIVE_RATE    = 0.001
+# revoked_at vem do relógio de cada worker; a janela cobre diferenças entre eles
+_SYNC_LOOKBACK = timedelta(seconds=30)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = _BLOOM_FALSE_POSITIVE_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k posições a partir de dois hashes de 64 bits
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+_bloom = BloomFilter(REVOKED_TOKENS_BLOOM_CAPACITY)
+_revoked: Dict[str, datetime] = {}           # jti -> expires_at
+_last_revoked_at: Optional[datetime] = None  # cursor do sync incremental
+_counters = {"checks": 0, "bloom_negatives": 0, "revoked_hits": 0}
+
+
+def _remember(jti: str, expires_at: datetime) -> None:
+    _revoked[jti] = expires_at
+    if len(_revoked) > _bloom.capacity:
+        _rebuild_bloom(capacity=_bloom.capacity * 2)
+    else:
+        _bloom.add(jti)
+
+
+def _rebuild_bloom(capacity: Optional[int] = None) -> None:
+    global _bloom
+    bloom = BloomFilter(capacity or _bloom.capacity)
+    for jti in _revoked:
+        bloom.add(jti)
+    _bloom = bloom
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    """Checagem em memória, sem round-trip ao banco."""
+    if not jti:
+        return False
+    _counters["checks"] += 1
+    if jti not in _bloom:
+        _counters["bloom_negatives"] += 1
+        return False
+    if jti in _revoked:
+        _counters["revoked_hits"] += 1
+        return True
+    return False
+
+
+def family_key(family: str) -> str:
+    return f"family:{family}"
+
+
+async def revoke(jti: str, user_id: str, expires_at: datetime) -> bool:
+    """Revoga o jti. True se esta chamada revogou; False se já estava revogado."""
+    collection = await get_revoked_tokens_collection()
+    try:
+        result = await collection.update_one(
+            {"_id": jti},
+            {"$setOnInsert": {
+                "user_id":    user_id,
+                "expires_at": expires_at,
+                "revoked_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+        newly = result.upserted_id is not None
+    except DuplicateKeyError:
+        newly = False    # upsert simultâneo: o outro inseriu primeiro
+    _remember(jti, expires_at)
+    return newly
+
+
+async def is_revoked_in_store(jti: str) -> bool:
+    """Checagem no banco, sem a janela do sync (usada na rotação)."""
+    if is_revoked(jti):
+        return True
+    collection = await get_revoked_tokens_collection()
+    doc = await collection.find_one({"_id": jti}, {"expires_at": 1})
+    if doc is None:
+        return False
+    _remember(jti, doc["expires_at"])
+    return True
+
+
+async def sync() -> int:
+    """Traz as revogações novas do banco; descarta as já expiradas."""
+    global _last_revoked_at
+    collection = await get_revoked_tokens_collection()
+    query = {"revoked_at": {"$gte": _last_revoked_at - _SYNC_LOOKBACK}} if _last_revoked_at else {}
+    loaded = 0
+    async for doc in collection.find(query, {"expires_at": 1, "revoked_at": 1}):
+        if doc["_id"] not in _revoked:
+            _remember(doc["_id"], doc["expires_at"])
+            loaded += 1
+        if _last_revoked_at is None or doc["revoked_at"] > _last_revoked_at:
+            _last_revoked_at = doc["revoked_at"]
+
+    now = datetime.utcnow()
+    expired = [jti for jti, expires_at in _revoked.items() if expires_at <= now]
+    if expired:
+        for jti in expired:
+            del _revoked[jti]
+        _rebuild_bloom()
+    return loaded
+
+
+async def sync_loop() -> None:
+    while True:
+        await asyncio.sleep(REVOKED_TOKENS_SYNC_SECONDS)
+        try:
+            await sync()
+        except PyMongoError as e:
+            logger.error(f"❌ Erro ao sincronizar tokens revogados: {e}")
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "revoked":         len(_revoked),
+        "bloom_bits":      _bloom.size,
+        "bloom_hashes":    _bloom.hashes,
+        "last_revoked_at": _last_revoked_at.isoformat() if _last_revoked_at else None,
+    }
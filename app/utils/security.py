@@ -1,32 +1,243 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Deque, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from app.database import get_app_settings_collection
 from app.models.user import TokenData, UserDB
-from app.database import get_users_collection
+from app.utils import loaders, revocation, user_cache
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+import logging
 import os
+import uuid
+
+logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "defaultsecret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# Access token curto; o app renova pelo POST /auth/refresh, sem bcrypt
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# ── Custo do bcrypt ───────────────────────────────────────────────────────────
+# calibrate_bcrypt() mede o maior custo cujo hash cabe em BCRYPT_TARGET_MS,
+# nunca abaixo de BCRYPT_MIN_ROUNDS nem acima de BCRYPT_MAX_ROUNDS. A medida
+# roda uma vez por implantação: no startup, pin_bcrypt_rounds() usa o custo
+# gravado em app_settings (_id "bcrypt") e só calibra se ainda não houver um —
+# o primeiro worker a gravar vence e todos usam o mesmo valor. Para
+# recalibrar (máquina nova), apague o documento. BCRYPT_ROUNDS fixa o custo
+# sem consultar o banco, com o mesmo piso BCRYPT_MIN_ROUNDS.
+# Só hashes com custo abaixo do escolhido são refeitos no login; o custo
+# nunca desce.
+BCRYPT_TARGET_MS  = float(os.getenv("BCRYPT_TARGET_MS", "100"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "14"))
+BCRYPT_ROUNDS     = os.getenv("BCRYPT_ROUNDS")
+
+_BCRYPT_SETTINGS_ID = "bcrypt"
+
+bcrypt_rounds: Optional[int] = None   # custo em uso (None = padrão do passlib)
+
+def configure_bcrypt_rounds(rounds: int) -> None:
+    """Hashes novos usam `rounds`; needs_update() acusa só custos menores."""
+    global bcrypt_rounds
+    bcrypt_rounds = rounds
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+def measure_bcrypt(rounds: int, samples: int = 3) -> float:
+    """Menor tempo (ms) de um hash bcrypt com esse custo."""
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds)
+    best = float("inf")
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash("calibration-password")
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def calibrate_bcrypt(target_ms: float = BCRYPT_TARGET_MS,
+                     min_rounds: int = BCRYPT_MIN_ROUNDS,
+                     max_rounds: int = BCRYPT_MAX_ROUNDS) -> int:
+    """Custo medido; cada rodada a mais dobra o tempo, então para no primeiro que estoura."""
+    rounds = min_rounds
+    elapsed = measure_bcrypt(rounds)
+    while rounds < max_rounds and elapsed * 2 <= target_ms:
+        rounds += 1
+        elapsed = measure_bcrypt(rounds)
+        if elapsed > target_ms:
+            rounds -= 1
+            break
+    return rounds
+
+async def pin_bcrypt_rounds() -> int:
+    """Custo da implantação (BCRYPT_ROUNDS ou app_settings), aplicado a este worker."""
+    if BCRYPT_ROUNDS:
+        rounds = max(int(BCRYPT_ROUNDS), BCRYPT_MIN_ROUNDS)
+        if rounds != int(BCRYPT_ROUNDS):
+            logger.warning(f"BCRYPT_ROUNDS={BCRYPT_ROUNDS} abaixo do mínimo; usando {rounds}")
+        source = "BCRYPT_ROUNDS"
+    else:
+        collection = await get_app_settings_collection()
+        doc = await collection.find_one({"_id": _BCRYPT_SETTINGS_ID})
+        if doc is None:
+            measured = await asyncio.get_running_loop().run_in_executor(None, calibrate_bcrypt)
+            try:
+                await collection.insert_one({
+                    "_id":           _BCRYPT_SETTINGS_ID,
+                    "rounds":        measured,
+                    "target_ms":     BCRYPT_TARGET_MS,
+                    "calibrated_at": datetime.utcnow(),
+                })
+            except DuplicateKeyError:
+                pass    # outro worker calibrou ao mesmo tempo: vale o dele
+            doc = await collection.find_one({"_id": _BCRYPT_SETTINGS_ID})
+        rounds = max(doc["rounds"], BCRYPT_MIN_ROUNDS)
+        source = "app_settings"
+    configure_bcrypt_rounds(rounds)
+    logger.info(f"🔐 bcrypt com custo {rounds} ({source})")
+    return rounds
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return bcrypt_rounds is not None and pwd_context.needs_update(hashed_password)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# ── bcrypt fora do event loop ─────────────────────────────────────────────────
+# Cada hash/verify leva ~200–300 ms de CPU; chamado direto no handler trava
+# todas as outras requisições do worker. As versões async rodam no pool
+# (thread: o bcrypt libera o GIL; process: isola a CPU) com no máximo
+# PASSWORD_HASH_MAX_CONCURRENCY operações simultâneas. Quem espera mais que
+# PASSWORD_HASH_QUEUE_TIMEOUT por uma vaga recebe 503 em vez de empilhar.
+PASSWORD_HASH_POOL            = os.getenv("PASSWORD_HASH_POOL", "thread").lower()
+PASSWORD_HASH_WORKERS         = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))
+PASSWORD_HASH_QUEUE_TIMEOUT   = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+
+_executor = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_hash_metrics = {"waiting": 0, "in_flight": 0, "completed": 0, "rejected": 0}
+_hash_latencies: Deque[float] = deque(maxlen=500)   # segundos, últimas operações
+_queue_waits: Deque[float] = deque(maxlen=500)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_POOL == "process":
+            # Os processos filhos não passam pela calibração do startup
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                initializer=configure_bcrypt_rounds if bcrypt_rounds else None,
+                initargs=(bcrypt_rounds,) if bcrypt_rounds else (),
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+            )
+    return _executor
+
+async def _run_password_op(func, *args):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PASSWORD_HASH_MAX_CONCURRENCY)
+
+    queued_at = time.perf_counter()
+    _hash_metrics["waiting"] += 1
+    try:
+        await asyncio.wait_for(_semaphore.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _hash_metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        _hash_metrics["waiting"] -= 1
+
+    started_at = time.perf_counter()
+    _queue_waits.append(started_at - queued_at)
+    _hash_metrics["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        _hash_metrics["in_flight"] -= 1
+        _hash_metrics["completed"] += 1
+        _hash_latencies.append(time.perf_counter() - started_at)
+        _semaphore.release()
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_op(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_op(verify_password, plain_password, hashed_password)
+
+def _percentiles_ms(samples) -> dict:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50": round(pick(0.50) * 1000, 1),
+        "p95": round(pick(0.95) * 1000, 1),
+        "max": round(ordered[-1] * 1000, 1),
+    }
+
+def password_hash_stats() -> dict:
+    return {
+        **_hash_metrics,
+        "pool":            PASSWORD_HASH_POOL,
+        "workers":         PASSWORD_HASH_WORKERS,
+        "max_concurrency": PASSWORD_HASH_MAX_CONCURRENCY,
+        "bcrypt_rounds":   bcrypt_rounds,
+        "latency_ms":      _percentiles_ms(_hash_latencies),
+        "queue_wait_ms":   _percentiles_ms(_queue_waits),
+    }
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": "access"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_refresh_token(user_id: str, family: Optional[str] = None) -> str:
+    """family identifica a sessão: o login abre uma, cada rotação a mantém."""
+    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return jwt.encode(
+        {"sub": user_id, "exp": expire, "jti": uuid.uuid4().hex, "type": "refresh",
+         "fam": family or uuid.uuid4().hex},
+        SECRET_KEY, algorithm=ALGORITHM,
+    )
+
+def refresh_family_expiry() -> datetime:
+    """Família revogada: nenhum token dela vive mais que um refresh novo."""
+    return datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """Payload validado (assinatura, exp, tipo e revogação); levanta JWTError."""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Tokens emitidos antes do refresh não têm "type": valem como access
+    if payload.get("type", "access") != token_type:
+        raise JWTError("tipo de token inválido")
+    if revocation.is_revoked(payload.get("jti")):
+        raise JWTError("token revogado")
+    if payload.get("fam") and revocation.is_revoked(revocation.family_key(payload["fam"])):
+        raise JWTError("sessão revogada")
+    return payload
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDB:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,7 +245,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDB:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -42,14 +253,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDB:
     except JWTError:
         raise credentials_exception
 
-    users_collection = await get_users_collection()
-    user = await users_collection.find_one({"_id": ObjectId(token_data.user_id)})
+    cached = user_cache.get(token_data.user_id)
+    if cached is not None:
+        return cached
+
+    try:
+        user = await loaders.users.load(ObjectId(token_data.user_id))
+    except InvalidId:
+        raise credentials_exception
     if user is None:
         raise credentials_exception
 
     user["id"] = str(user["_id"])
     del user["_id"]
-    return UserDB(**user)
+    current_user = UserDB(**user)
+    user_cache.put(current_user)
+    return current_user
 
 async def get_current_active_user(current_user: UserDB = Depends(get_current_user)):
     if current_user.disabled:
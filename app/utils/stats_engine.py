@@ -0,0 +1,115 @@
+"""
+Motor de agregação do dashboard de estatísticas.
+
+Todo o agrupamento (mensal, por categoria e top gastos) é feito no MongoDB
+via aggregation pipeline — só os buckets já somados trafegam até o Python.
+Das anotações só são lidos os campos numéricos extraídos na escrita.
+Projetos e anotações rodam em pipelines separados, executados em paralelo;
+user_stats.compute_document mescla os buckets no documento materializado.
+"""
+
+import asyncio
+from typing import List, Tuple
+
+from app.database import get_projects_collection, get_notes_collection
+
+TOP_N = 5
+
+_PT_MONTHS = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun",
+              "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+# ── Estágios compartilhados ───────────────────────────────────────────────────
+
+def _bucket_facets(top_n: int, *prefix: dict) -> dict:
+    """
+    Sub-pipelines do $facet comuns aos dois pipelines. Esperam documentos já
+    projetados em {_id, title, amount, category, date}; `prefix` filtra antes.
+    """
+    return {
+        "monthly": [
+            *prefix,
+            {"$addFields": {
+                "date": {"$convert": {
+                    "input": "$date", "to": "date", "onError": None, "onNull": None,
+                }},
+            }},
+            {"$match": {"date": {"$ne": None}}},
+            {"$group": {
+                "_id":   {"year": {"$year": "$date"}, "month": {"$month": "$date"}},
+                "total": {"$sum": "$amount"},
+            }},
+        ],
+        "by_category": [
+            *prefix,
+            {"$group": {
+                "_id":   "$category",
+                "total": {"$sum": "$amount"},
+                "first": {"$min": "$_id"},   # preserva a ordem de aparição
+            }},
+            {"$sort": {"first": 1}},
+        ],
+        "top": [
+            *prefix,
+            {"$sort": {"amount": -1, "_id": 1}},
+            {"$limit": top_n},
+            {"$project": {"title": 1, "amount": 1}},
+        ],
+    }
+
+
+_SUM_AMOUNT = {"$group": {
+    "_id":   None,
+    "total": {"$sum": "$amount"},
+    "count": {"$sum": {"$cond": [{"$gt": ["$amount", 0]}, 1, 0]}},
+}}
+
+
+def _project_pipeline(user_id: str, top_n: int = TOP_N) -> List[dict]:
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$project": {
+            "title":    {"$ifNull": ["$title", ""]},
+            "category": {"$ifNull": ["$category", "Outros"]},
+            "amount":   {"$ifNull": ["$applied_value", 0.0]},
+            "date":     "$start_date",
+        }},
+        {"$facet": {
+            # total_invested soma todos os projetos, inclusive os zerados
+            "totals": [_SUM_AMOUNT],
+            **_bucket_facets(top_n, {"$match": {"amount": {"$gt": 0}}}),
+        }},
+    ]
+
+
+def _note_pipeline(user_id: str, top_n: int = TOP_N) -> List[dict]:
+    # Valor e categoria já vêm extraídos na escrita (ver app/utils/note_parser.py)
+    return [
+        {"$match": {"user_id": user_id, "max_amount": {"$gt": 0}}},
+        {"$project": {
+            "title":    {"$ifNull": ["$title", "Sem título"]},
+            "date":     {"$ifNull": ["$date", "$created_at"]},
+            "amount":   "$max_amount",
+            "category": {"$ifNull": ["$category", "Outros"]},
+        }},
+        {"$facet": {"totals": [_SUM_AMOUNT], **_bucket_facets(top_n)}},
+    ]
+
+
+# ── Execução ──────────────────────────────────────────────────────────────────
+
+async def _run(collection, pipeline: List[dict]) -> dict:
+    result = await collection.aggregate(pipeline).to_list(length=1)
+    return result[0] if result else {}
+
+
+async def aggregate_facets(user_id: str, top_n: int = TOP_N) -> Tuple[dict, dict]:
+    """Roda os pipelines de projetos e anotações em paralelo."""
+    projects_col = await get_projects_collection()
+    notes_col    = await get_notes_collection()
+
+    return await asyncio.gather(
+        _run(projects_col, _project_pipeline(user_id, top_n)),
+        _run(notes_col,    _note_pipeline(user_id, top_n)),
+    )
+
@@ -0,0 +1,85 @@
+"""
+Respostas de listagem em streaming, direto do cursor do Motor.
+
+Em vez de montar a lista inteira de modelos (memória proporcional ao
+resultado e nenhum byte enviado até o fim), os documentos são convertidos e
+codificados em lotes de STREAM_BATCH_SIZE conforme chegam do cursor. O
+StreamingResponse só pede o próximo lote depois de entregar o anterior ao
+socket, então um cliente lento segura a leitura do cursor (backpressure).
+
+Formato pelo header Accept:
+  application/x-ndjson   um objeto JSON por linha
+  qualquer outro         array JSON (o formato de sempre, esperado pelo Flutter)
+"""
+
+import logging
+import os
+from typing import Any, AsyncIterator, List, TypeVar
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.utils.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "100"))
+
+NDJSON = "application/x-ndjson"
+
+T = TypeVar("T")
+
+
+async def batched(items: AsyncIterator[T], size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[T]]:
+    batch: List[T] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+
+def encode(item: Any) -> bytes:
+    """Dicts já no formato de saída (fast_json.to_public) ou modelos."""
+    return dumps(item.dict() if isinstance(item, BaseModel) else item)
+
+
+async def _ndjson(batches: AsyncIterator[List[Any]]) -> AsyncIterator[bytes]:
+    async for items in batches:
+        yield b"".join(encode(item) + b"\n" for item in items)
+
+
+async def _json_array(batches: AsyncIterator[List[Any]]) -> AsyncIterator[bytes]:
+    yield b"["
+    first = True
+    async for items in batches:
+        if not items:
+            continue
+        chunk = b",".join(encode(item) for item in items)
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+async def _logged(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # O status 200 já foi enviado: um erro aqui só pode encerrar a conexão
+    try:
+        async for chunk in body:
+            yield chunk
+    except Exception as e:
+        logger.error(f"❌ Erro durante resposta em streaming: {e}", exc_info=True)
+        raise
+
+
+def stream_list(request: Request, batches: AsyncIterator[List[Any]]) -> StreamingResponse:
+    """Lotes de itens → StreamingResponse em NDJSON ou array JSON."""
+    if wants_ndjson(request):
+        return StreamingResponse(_logged(_ndjson(batches)), media_type=NDJSON)
+    return StreamingResponse(_logged(_json_array(batches)), media_type="application/json")
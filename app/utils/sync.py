@@ -0,0 +1,90 @@
+"""
+Sincronização incremental do app (GET /sync).
+
+O token é opaco para o cliente: base64 de um JSON com o instante em que a
+sincronização anterior começou. A próxima consulta pega o que mudou desde
+então pelos índices (user_id, updated_at) de projects, notes e
+project_transactions, e as exclusões pela coleção sync_tombstones, que as
+rotas de DELETE alimentam via record_deletion().
+
+A janela volta SYNC_LOOKBACK_SECONDS antes do token: uma escrita com
+updated_at carimbado antes da consulta mas gravada depois dela (ou com o
+relógio do banco um pouco atrás, no caso do $$NOW dos aportes) não se perde.
+O custo é reenviar alguns itens — o cliente aplica tudo por id, então a
+repetição é inofensiva.
+
+Tombstones vivem SYNC_TOMBSTONE_DAYS. Token mais antigo que isso (ou
+ausente) devolve o estado completo com full=true: o cliente descarta o que
+tem localmente e usa a resposta.
+"""
+
+import base64
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.database import get_sync_tombstones_collection
+
+SYNC_LOOKBACK_SECONDS = int(os.getenv("SYNC_LOOKBACK_SECONDS", "30"))
+SYNC_TOMBSTONE_DAYS   = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+KINDS = ("project", "note")
+
+
+def encode_token(started_at: datetime) -> str:
+    raw = json.dumps({"t": started_at.isoformat()})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Token de sincronização inválido")
+
+
+def window_start(token: Optional[str], now: datetime) -> Optional[datetime]:
+    """
+    Limite inferior de updated_at para a consulta, ou None quando o cliente
+    precisa do estado completo (sem token ou tombstones já expirados).
+    """
+    if not token:
+        return None
+    since = decode_token(token)
+    if since < now - timedelta(days=SYNC_TOMBSTONE_DAYS):
+        return None
+    return since - timedelta(seconds=SYNC_LOOKBACK_SECONDS)
+
+
+async def record_deletion(user_id: str, kind: str, entity_ids: List[str]) -> None:
+    if not entity_ids:
+        return
+    collection = await get_sync_tombstones_collection()
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=SYNC_TOMBSTONE_DAYS)
+    await collection.insert_many([
+        {
+            "user_id":    user_id,
+            "kind":       kind,
+            "entity_id":  entity_id,
+            "deleted_at": now,
+            "expires_at": expires_at,
+        }
+        for entity_id in entity_ids
+    ])
+
+
+async def deletions_since(user_id: str, since: datetime) -> Dict[str, List[str]]:
+    collection = await get_sync_tombstones_collection()
+    deleted: Dict[str, List[str]] = {kind: [] for kind in KINDS}
+    async for tombstone in collection.find(
+        {"user_id": user_id, "deleted_at": {"$gte": since}},
+        {"kind": 1, "entity_id": 1},
+    ):
+        deleted.setdefault(tombstone["kind"], []).append(tombstone["entity_id"])
+    return deleted
@@ -0,0 +1,294 @@
+"""
+Histórico de aportes em buckets (coleção project_transactions).
+
+Padrão bucket: um documento por projeto por mês, com no máximo BUCKET_SIZE
+transações em um array de tamanho fixo e os totais pré-calculados:
+
+  {project_id, user_id, month: "2024-03", transactions: [...],
+   count, sum, created_at, updated_at}
+
+Quando o bucket do mês enche, o próximo aporte abre outro (o upsert filtra
+por count < BUCKET_SIZE). O documento do projeto guarda só os últimos aportes
+(subset para as telas) e transactions_count.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+from app.database import get_projects_collection, get_project_transactions_collection
+from app.models.project import ProjectDB
+from app.utils.fast_json import to_public
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SIZE = 200
+
+# Aportes mantidos embutidos no documento do projeto (subset recente)
+RECENT_TRANSACTIONS = int(os.getenv("PROJECT_RECENT_TRANSACTIONS", "5"))
+
+# Migração do histórico embutido: quem pega o projeto marca `migrating`; uma
+# marca mais velha que isso é de um worker que morreu no meio
+MIGRATION_STALE_SECONDS = 300
+MIGRATION_WAIT_SECONDS  = 10
+_MIGRATION_POLL_SECONDS = 0.1
+
+
+def month_of(dt: datetime) -> str:
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+
+def bucket_upsert(project_id: str, user_id: str, transaction: dict) -> Tuple[dict, dict]:
+    """Filtro e update (upsert) que anexam a transação ao bucket do mês."""
+    return (
+        {
+            "project_id": project_id,
+            "month":      month_of(transaction["created_at"]),
+            "count":      {"$lt": BUCKET_SIZE},
+        },
+        {
+            "$push":        {"transactions": transaction},
+            "$inc":         {"count": 1, "sum": transaction["amount"]},
+            "$set":         {"updated_at": transaction["created_at"]},
+            "$setOnInsert": {"user_id": user_id, "created_at": transaction["created_at"]},
+        },
+    )
+
+
+async def append_transaction(project_id: str, user_id: str, transaction: dict,
+                             session=None) -> None:
+    collection = await get_project_transactions_collection()
+    query, update = bucket_upsert(project_id, user_id, transaction)
+    await collection.update_one(query, update, upsert=True, session=session)
+
+
+async def delete_project_transactions(*project_ids: str) -> None:
+    collection = await get_project_transactions_collection()
+    if len(project_ids) == 1:
+        await collection.delete_many({"project_id": project_ids[0]})
+    elif project_ids:
+        await collection.delete_many({"project_id": {"$in": list(project_ids)}})
+
+
+# ── Projeção do projeto ───────────────────────────────────────────────────────
+# O projeto guarda só os últimos RECENT_TRANSACTIONS aportes +
+# transactions_count. Projetos ainda não migrados têm o histórico inteiro
+# embutido e nenhum transactions_count — a projeção cobre os dois formatos.
+# Usada pelas rotas de projetos e pelo /sync.
+
+_PROJECT_FIELDS = (
+    "title", "description", "category", "required_value", "applied_value",
+    "start_date", "user_id", "created_at", "updated_at", "progress",
+)
+
+
+def project_projection(include: Optional[str] = None) -> dict:
+    projection = {field: 1 for field in _PROJECT_FIELDS}
+    projection["transactions_count"] = {"$ifNull": [
+        "$transactions_count", {"$size": {"$ifNull": ["$transactions", []]}},
+    ]}
+    projection["legacy_transactions"] = {"$eq": [{"$type": "$transactions_count"}, "missing"]}
+    projection["transactions"] = (
+        1 if include == "transactions" else {"$slice": -RECENT_TRANSACTIONS}
+    )
+    return projection
+
+
+def prepare_project(project: dict) -> dict:
+    project["id"] = str(project["_id"])
+    if "transactions" not in project:
+        project["transactions"] = []    # projetos antigos sem o campo
+    project.setdefault("transactions_count", len(project["transactions"]))
+    return project
+
+
+def to_project_out(project: dict) -> dict:
+    """Leitura: mesmo formato do ProjectDB, sem validar (ver fast_json)."""
+    return to_public(prepare_project(project), ProjectDB)
+
+
+# ── Leitura ───────────────────────────────────────────────────────────────────
+
+def _encode_cursor(month: str, bucket_id: ObjectId, offset: int) -> str:
+    raw = json.dumps({"m": month, "b": str(bucket_id), "o": offset})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, ObjectId, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return data["m"], ObjectId(data["b"]), int(data["o"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+
+async def iter_transactions(project_id: str, cursor: Optional[str] = None):
+    """
+    Percorre os buckets do projeto em ordem de tempo (month, _id), sem
+    carregar todos de uma vez. Gera (transação, cursor_da_próxima).
+    """
+    collection = await get_project_transactions_collection()
+    query: dict = {"project_id": project_id}
+    offset = 0
+    if cursor:
+        month, bucket_id, offset = _decode_cursor(cursor)
+        query["$or"] = [
+            {"month": {"$gt": month}},
+            {"month": month, "_id": {"$gte": bucket_id}},
+        ]
+
+    buckets = collection.find(
+        query, {"transactions": 1, "month": 1}
+    ).sort([("month", ASCENDING), ("_id", ASCENDING)]).batch_size(4)
+
+    async for bucket in buckets:
+        items = bucket.get("transactions", [])
+        for index in range(offset, len(items)):
+            yield items[index], _encode_cursor(bucket["month"], bucket["_id"], index + 1)
+        offset = 0
+
+
+async def list_transactions_page(
+    project_id: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    items: List[dict] = []
+    next_cursor = None
+    transactions = iter_transactions(project_id, cursor)
+    try:
+        async for transaction, position in transactions:
+            if len(items) == limit:
+                break
+            items.append(transaction)
+            next_cursor = position
+        else:
+            next_cursor = None    # percorreu tudo: não há próxima página
+    finally:
+        await transactions.aclose()
+    return items, next_cursor
+
+
+async def load_transactions(project_ids: List[str]) -> Dict[str, List[dict]]:
+    """Histórico completo de vários projetos em uma consulta ($in)."""
+    collection = await get_project_transactions_collection()
+    history: Dict[str, List[dict]] = {pid: [] for pid in project_ids}
+    async for bucket in collection.find(
+        {"project_id": {"$in": project_ids}},
+        {"project_id": 1, "transactions": 1},
+    ).sort([("project_id", ASCENDING), ("month", ASCENDING), ("_id", ASCENDING)]):
+        history[bucket["project_id"]].extend(bucket.get("transactions", []))
+    return history
+
+
+# ── Migração a partir do array embutido ───────────────────────────────────────
+
+async def migrate_project(project_id: ObjectId, recent: int = RECENT_TRANSACTIONS) -> bool:
+    """
+    Copia o array embutido do projeto para os buckets e corta o array para
+    os `recent` últimos. Retorna False se já migrado (ou migrado por outra
+    chamada enquanto esta esperava).
+
+    A migração é reivindicada com um $set condicional de `migrating`: chamadas
+    simultâneas no mesmo projeto (aporte, listagem, /sync) não copiam o
+    histórico duas vezes — as outras esperam até MIGRATION_WAIT_SECONDS pelo
+    transactions_count, já que o aporte só grava em projeto migrado.
+    Transações já presentes nos buckets (pelo id) não são copiadas de novo,
+    o que cobre a retomada depois de um worker morto no meio.
+    """
+    projects_collection = await get_projects_collection()
+    collection          = await get_project_transactions_collection()
+
+    now = datetime.utcnow()
+    project = await projects_collection.find_one_and_update(
+        {
+            "_id": project_id,
+            "transactions_count": {"$exists": False},
+            "$or": [
+                {"migrating": {"$exists": False}},
+                {"migrating": {"$lt": now - timedelta(seconds=MIGRATION_STALE_SECONDS)}},
+            ],
+        },
+        {"$set": {"migrating": now}},
+        projection={"transactions": 1, "user_id": 1},
+    )
+    if project is None:
+        await _wait_migration(project_id)
+        return False
+
+    pid = str(project_id)
+    known = set(await collection.distinct("transactions.id", {"project_id": pid}))
+
+    by_month: Dict[str, List[dict]] = {}
+    for t in sorted(project.get("transactions", []), key=lambda t: t["created_at"]):
+        t = {
+            "id":         t.get("id") or str(ObjectId()),
+            "amount":     t["amount"],
+            "note":       t.get("note", ""),
+            "created_at": t["created_at"],
+        }
+        if t["id"] not in known:
+            by_month.setdefault(month_of(t["created_at"]), []).append(t)
+
+    buckets = []
+    for month, items in by_month.items():
+        for start in range(0, len(items), BUCKET_SIZE):
+            chunk = items[start:start + BUCKET_SIZE]
+            buckets.append({
+                "project_id":   pid,
+                "user_id":      project.get("user_id"),
+                "month":        month,
+                "transactions": chunk,
+                "count":        len(chunk),
+                "sum":          sum(t["amount"] for t in chunk),
+                "created_at":   chunk[0]["created_at"],
+                "updated_at":   chunk[-1]["created_at"],
+            })
+    if buckets:
+        await collection.insert_many(buckets)
+
+    count = len(known) + sum(b["count"] for b in buckets)
+    await projects_collection.update_one(
+        {"_id": project_id, "transactions_count": {"$exists": False}},
+        {
+            "$set":   {"transactions_count": count},
+            "$unset": {"migrating": ""},
+            # $slice com $each vazio apenas corta — não perde aportes concorrentes
+            "$push":  {"transactions": {"$each": [], "$slice": -recent}},
+        },
+    )
+    return True
+
+
+async def _wait_migration(project_id: ObjectId) -> None:
+    """Espera a migração de outra chamada terminar (ou o projeto sumir)."""
+    projects_collection = await get_projects_collection()
+    deadline = asyncio.get_running_loop().time() + MIGRATION_WAIT_SECONDS
+    while True:
+        project = await projects_collection.find_one(
+            {"_id": project_id}, {"transactions_count": 1, "migrating": 1}
+        )
+        if not project or "transactions_count" in project or "migrating" not in project:
+            return
+        if asyncio.get_running_loop().time() >= deadline:
+            logger.warning(f"Migração do projeto {project_id} ainda em andamento")
+            return
+        await asyncio.sleep(_MIGRATION_POLL_SECONDS)
+
+
+async def migrate_all(recent: int = RECENT_TRANSACTIONS) -> int:
+    projects_collection = await get_projects_collection()
+    migrated = 0
+    async for project in projects_collection.find(
+        {"transactions_count": {"$exists": False}}, {"_id": 1}
+    ):
+        if await migrate_project(project["_id"], recent):
+            migrated += 1
+    return migrated
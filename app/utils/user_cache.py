@@ -0,0 +1,64 @@
+"""
+Cache em processo dos usuários autenticados (get_current_user).
+
+Sem ele, toda requisição autenticada faz um find_one em users pelo _id —
+a consulta mais frequente da API. As entradas expiram após
+USER_CACHE_TTL_SECONDS (limite de quanto outro worker pode servir dados
+antigos) e o LRU limita o total a USER_CACHE_MAX_SIZE. Toda rota que altera
+o documento do usuário chama invalidate(user_id). TTL 0 desliga o cache.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.models.user import UserDB
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE    = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+_cache: "OrderedDict[str, Tuple[float, UserDB]]" = OrderedDict()
+_counters: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def get(user_id: str) -> Optional[UserDB]:
+    cached = _cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < USER_CACHE_TTL_SECONDS:
+        _cache.move_to_end(user_id)
+        _counters["hits"] += 1
+        return cached[1].copy()
+    if cached:
+        del _cache[user_id]
+    _counters["misses"] += 1
+    return None
+
+
+def put(user: UserDB) -> None:
+    if USER_CACHE_TTL_SECONDS <= 0 or USER_CACHE_MAX_SIZE <= 0:
+        return
+    _cache[user.id] = (time.monotonic(), user.copy())
+    _cache.move_to_end(user.id)
+    while len(_cache) > USER_CACHE_MAX_SIZE:
+        _cache.popitem(last=False)
+        _counters["evictions"] += 1
+
+
+def invalidate(user_id: Optional[str] = None) -> None:
+    """Descarta o usuário em cache (ou todos)."""
+    _counters["invalidations"] += 1
+    if user_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(str(user_id), None)
+
+
+def stats() -> dict:
+    lookups = _counters["hits"] + _counters["misses"]
+    return {
+        **_counters,
+        "size":        len(_cache),
+        "max_size":    USER_CACHE_MAX_SIZE,
+        "ttl_seconds": USER_CACHE_TTL_SECONDS,
+        "hit_ratio":   round(_counters["hits"] / lookups, 4) if lookups else 0.0,
+    }
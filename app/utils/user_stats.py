@@ -0,0 +1,355 @@
+"""
+Estatísticas materializadas por usuário (coleção user_stats).
+
+Um documento por usuário (_id = user_id) com os totais, os buckets mensais e
+por categoria e uma lista limitada com os TOP_K maiores gastos. Cada rota de
+escrita (notas, projetos, aportes) chama record_note/record_project com o
+documento antes e depois da alteração; a diferença vira um único update.
+
+Se o documento ainda não existir (usuário antigo ou novo), ele é reconstruído
+a partir das coleções de origem na primeira escrita registrada ou na primeira
+leitura do /stats/summary.
+
+data_version sobe a cada escrita registrada (e a cada rebuild) e nunca
+volta: é a base dos ETags das listagens e do resumo (ver app/utils/etag.py).
+Se a atualização incremental falhar, um segundo update (com upsert) sobe
+data_version e marca o documento `stale`: os ETags antigos deixam de valer e
+a próxima leitura do resumo reconstrói os totais.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.database import get_user_stats_collection
+from app.models.stats import StatsSummary, MonthlyStat, CategoryStat, TopExpense
+from app.utils.stats_engine import TOP_N, _PT_MONTHS, aggregate_facets
+
+logger = logging.getLogger(__name__)
+
+# Guardamos mais que TOP_N para absorver remoções sem recalcular a lista
+TOP_K = 20
+
+# Tolerância para comparar somas em ponto flutuante na checagem de drift
+_DRIFT_TOLERANCE = 0.01
+
+
+# ── Chaves de bucket ──────────────────────────────────────────────────────────
+# Categorias de projeto são texto livre; "." e "$" não podem ir em caminhos
+# de update, então escapamos de forma reversível.
+
+def _encode_key(name: str) -> str:
+    return name.replace("\\", "\\\\").replace(".", "\\u002e").replace("$", "\\u0024")
+
+
+def _decode_key(key: str) -> str:
+    return key.replace("\\u0024", "$").replace("\\u002e", ".").replace("\\\\", "\\")
+
+
+def _month_key(raw) -> Optional[str]:
+    if not raw:
+        return None
+    try:
+        dt = raw if isinstance(raw, datetime) else \
+             datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except Exception:
+        return None
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+
+# ── Contribuição de cada documento ────────────────────────────────────────────
+
+def _project_item(doc: Optional[dict]) -> Optional[dict]:
+    if not doc:
+        return None
+    applied = doc.get("applied_value", 0.0) or 0.0
+    return {
+        "ref":      f"project:{doc['_id']}",
+        "source":   "project",
+        "total":    applied,                       # total_invested soma todos
+        "amount":   applied if applied > 0 else 0.0,
+        "title":    doc.get("title", ""),
+        "category": doc.get("category") or "Outros",
+        "month":    _month_key(doc.get("start_date")),
+    }
+
+
+def _note_item(doc: Optional[dict]) -> Optional[dict]:
+    if not doc:
+        return None
+    amount = doc.get("max_amount", 0.0) or 0.0
+    return {
+        "ref":      f"note:{doc['_id']}",
+        "source":   "note",
+        "total":    amount,
+        "amount":   amount,
+        "title":    doc.get("title", "Sem título"),
+        "category": doc.get("category") or "Outros",
+        "month":    _month_key(doc.get("date") or doc.get("created_at")),
+    }
+
+
+def _increments(before: Optional[dict], after: Optional[dict]) -> Dict[str, float]:
+    inc: Dict[str, float] = defaultdict(float)
+    for item, sign in ((before, -1), (after, 1)):
+        if not item:
+            continue
+        total_field = "total_invested" if item["source"] == "project" else "total_notes_value"
+        inc[total_field] += sign * item["total"]
+        if item["amount"] <= 0:
+            continue
+        inc["item_count"] += sign
+        if item["month"]:
+            inc[f"monthly.{item['month']}"] += sign * item["amount"]
+        inc[f"by_category.{_encode_key(item['category'])}"] += sign * item["amount"]
+    return {k: v for k, v in inc.items() if v != 0}
+
+
+def _top_entry(item: dict) -> dict:
+    return {
+        "ref":    item["ref"],
+        "title":  item["title"],
+        "amount": item["amount"],
+        "source": item["source"],
+    }
+
+
+# ── Atualização incremental ───────────────────────────────────────────────────
+
+def _top_expression(ref: str, item: Optional[dict]) -> dict:
+    """
+    Novo valor de `top` como expressão: tira `ref` da lista e, se `item`
+    vier, reinsere na posição do amount (a lista já está em ordem), cortando
+    em TOP_K.
+    """
+    others = {"$filter": {"input": {"$ifNull": ["$top", []]}, "as": "t",
+                          "cond":  {"$ne": ["$$t.ref", ref]}}}
+    if item is None:
+        return others
+    amount = item["amount"]
+    return {"$slice": [{"$concatArrays": [
+        {"$filter": {"input": others, "as": "t", "cond": {"$gte": ["$$t.amount", amount]}}},
+        {"$literal": [_top_entry(item)]},    # título pode começar com "$"
+        {"$filter": {"input": others, "as": "t", "cond": {"$lt": ["$$t.amount", amount]}}},
+    ]}, TOP_K]}
+
+
+async def _apply(user_id: str, before: Optional[dict], after: Optional[dict]) -> None:
+    col = await get_user_stats_collection()
+    ref = (after or before)["ref"]
+    new_amount = after["amount"] if after else 0.0
+
+    # Um único update em pipeline: totais, versão e lista top mudam juntos,
+    # sem janela entre tirar e reinserir o item da lista
+    fields = {
+        field: {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}
+        for field, delta in _increments(before, after).items()
+    }
+    # data_version sobe mesmo sem mudança nos totais (ex.: título editado)
+    fields["data_version"] = {"$add": [{"$ifNull": ["$data_version", 0]}, 1]}
+    fields["updated_at"]   = datetime.utcnow()
+    fields["top"]          = _top_expression(ref, after if new_amount > 0 else None)
+
+    current = await col.find_one_and_update(
+        {"_id": user_id},
+        [{"$set": fields}],
+        projection={"top": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if current is None:
+        # Sem documento (usuário antigo ou primeira escrita): monta a partir
+        # da origem, que já inclui esta escrita
+        await rebuild(user_id)
+        return
+
+    top = current.get("top", [])
+    listed = next((t for t in top if t["ref"] == ref), None)
+    if listed is not None and new_amount < listed["amount"] and len(top) >= TOP_K:
+        # Item listado diminuiu com a lista cheia: algum item de fora pode
+        # ter passado à frente — recalcula a lista a partir da origem
+        await rebuild(user_id)
+
+
+async def _safe_apply(user_id: str, before: Optional[dict], after: Optional[dict]) -> None:
+    # Falha nos totais não derruba a escrita principal (o rebuild corrige),
+    # mas a versão precisa subir: sem isso o If-None-Match continuaria
+    # devolvendo 304 com dados velhos. Se nem isso gravar, o erro sobe.
+    try:
+        await _apply(user_id, before, after)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar user_stats de {user_id}: {e}")
+        await mark_stale(user_id)
+
+
+async def mark_stale(user_id: str) -> None:
+    """Invalida os ETags do usuário e agenda o rebuild para a próxima leitura."""
+    col = await get_user_stats_collection()
+    await col.update_one(
+        {"_id": user_id},
+        {"$inc": {"data_version": 1},
+         "$set": {"stale": True, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def record_project(user_id: str, before: Optional[dict], after: Optional[dict]) -> None:
+    """Aplica a diferença entre o projeto antes/depois (None = inexistente)."""
+    await _safe_apply(user_id, _project_item(before), _project_item(after))
+
+
+async def record_note(user_id: str, before: Optional[dict], after: Optional[dict]) -> None:
+    """Aplica a diferença entre a anotação antes/depois (None = inexistente)."""
+    await _safe_apply(user_id, _note_item(before), _note_item(after))
+
+
+# ── Reconstrução a partir da origem ───────────────────────────────────────────
+
+async def compute_document(user_id: str) -> dict:
+    """Recalcula o documento de user_stats pelos pipelines de agregação."""
+    project_facet, note_facet = await aggregate_facets(user_id, top_n=TOP_K)
+
+    doc: dict = {
+        "_id":               user_id,
+        "total_invested":    0.0,
+        "total_notes_value": 0.0,
+        "item_count":        0,
+        "monthly":           {},
+        "by_category":       {},
+        "top":               [],
+    }
+    for source, facet, total_field in (
+        ("project", project_facet, "total_invested"),
+        ("note",    note_facet,    "total_notes_value"),
+    ):
+        totals = facet.get("totals") or []
+        if totals:
+            doc[total_field] += totals[0]["total"]
+            doc["item_count"] += totals[0]["count"]
+        for row in facet.get("monthly", []):
+            key = f"{row['_id']['year']:04d}-{row['_id']['month']:02d}"
+            doc["monthly"][key] = doc["monthly"].get(key, 0.0) + row["total"]
+        for row in facet.get("by_category", []):
+            key = _encode_key(row["_id"])
+            doc["by_category"][key] = doc["by_category"].get(key, 0.0) + row["total"]
+        doc["top"] += [
+            {"ref": f"{source}:{t['_id']}", "title": t["title"],
+             "amount": t["amount"], "source": source}
+            for t in facet.get("top", [])
+        ]
+
+    doc["top"] = sorted(doc["top"], key=lambda x: x["amount"], reverse=True)[:TOP_K]
+    return doc
+
+
+async def rebuild(user_id: str) -> dict:
+    col = await get_user_stats_collection()
+    doc = await compute_document(user_id)
+    doc["updated_at"] = datetime.utcnow()
+    fields = {k: v for k, v in doc.items() if k != "_id"}
+    # $inc em vez de replace: data_version continua subindo (ETags antigos
+    # nunca voltam a valer)
+    return await col.find_one_and_update(
+        {"_id": user_id},
+        {"$set": fields, "$inc": {"data_version": 1}, "$unset": {"stale": ""}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _diff_buckets(name: str, stored: dict, expected: dict) -> List[str]:
+    problems = []
+    for key in sorted(set(stored) | set(expected)):
+        a, b = stored.get(key, 0.0), expected.get(key, 0.0)
+        if abs(a - b) > _DRIFT_TOLERANCE:
+            problems.append(f"{name}[{_decode_key(key)}]: armazenado={a:.2f} esperado={b:.2f}")
+    return problems
+
+
+async def check_drift(user_id: str) -> List[str]:
+    """Compara o documento materializado com o recálculo; [] = sem drift."""
+    col      = await get_user_stats_collection()
+    stored   = await col.find_one({"_id": user_id})
+    expected = await compute_document(user_id)
+    if stored is None:
+        return ["documento user_stats inexistente"]
+
+    problems = ["documento marcado stale (rebuild pendente)"] if stored.get("stale") else []
+    for field in ("total_invested", "total_notes_value"):
+        a, b = stored.get(field, 0.0), expected[field]
+        if abs(a - b) > _DRIFT_TOLERANCE:
+            problems.append(f"{field}: armazenado={a:.2f} esperado={b:.2f}")
+    if stored.get("item_count", 0) != expected["item_count"]:
+        problems.append(
+            f"item_count: armazenado={stored.get('item_count', 0)} esperado={expected['item_count']}"
+        )
+    problems += _diff_buckets("monthly", stored.get("monthly", {}), expected["monthly"])
+    problems += _diff_buckets("by_category", stored.get("by_category", {}), expected["by_category"])
+
+    stored_top   = [round(t["amount"], 2) for t in stored.get("top", [])[:TOP_N]]
+    expected_top = [round(t["amount"], 2) for t in expected["top"][:TOP_N]]
+    if stored_top != expected_top:
+        problems.append(f"top: armazenado={stored_top} esperado={expected_top}")
+    return problems
+
+
+# ── Leitura ───────────────────────────────────────────────────────────────────
+
+def summary_from_document(doc: dict) -> StatsSummary:
+    total_invested    = doc.get("total_invested", 0.0)
+    total_notes_value = doc.get("total_notes_value", 0.0)
+
+    monthly = []
+    for key, total in sorted(doc.get("monthly", {}).items()):
+        if round(total, 2) <= 0:
+            continue
+        y, m = (int(part) for part in key.split("-"))
+        monthly.append(MonthlyStat(month=_PT_MONTHS[m - 1], year=y, total=round(total, 2)))
+
+    cat_buckets = {
+        _decode_key(key): total
+        for key, total in doc.get("by_category", {}).items()
+        if round(total, 2) > 0
+    }
+    grand = sum(cat_buckets.values()) or 1
+    by_category = sorted(
+        [
+            CategoryStat(
+                category=cat,
+                total=round(total, 2),
+                percentage=round((total / grand) * 100, 1),
+            )
+            for cat, total in cat_buckets.items()
+        ],
+        key=lambda x: x.total,
+        reverse=True,
+    )
+
+    top_expenses = [
+        TopExpense(title=t["title"], amount=t["amount"], source=t["source"])
+        for t in doc.get("top", [])[:TOP_N]
+    ]
+
+    return StatsSummary(
+        total_invested=    round(total_invested, 2),
+        total_notes_value= round(total_notes_value, 2),
+        grand_total=       round(total_invested + total_notes_value, 2),
+        monthly=           monthly,
+        by_category=       by_category,
+        top_expenses=      top_expenses,
+    )
+
+
+async def load_document(user_id: str) -> dict:
+    """Um find_one pelo _id; reconstrói se o documento não existir ou estiver stale."""
+    col = await get_user_stats_collection()
+    doc = await col.find_one({"_id": user_id})
+    if doc is None or doc.get("stale"):
+        doc = await rebuild(user_id)
+    return doc
+
+
+async def load_summary(user_id: str) -> StatsSummary:
+    return summary_from_document(await load_document(user_id))
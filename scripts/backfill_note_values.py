@@ -0,0 +1,28 @@
+"""
+Migração: grava extracted_amounts, max_amount e category nas notas antigas.
+
+Uso:
+  python -m scripts.backfill_note_values                  # só notas sem os campos
+  python -m scripts.backfill_note_values --recompute      # reprocessa todas
+  python -m scripts.backfill_note_values --batch-size 1000
+
+Idempotente — pode ser executada com a API no ar.
+"""
+
+import argparse
+import asyncio
+
+from app.utils.note_parser import backfill
+
+
+async def main(args) -> None:
+    updated = await backfill(batch_size=args.batch_size, recompute=args.recompute)
+    print(f"{updated} nota(s) atualizada(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--recompute", action="store_true",
+                        help="reprocessa também notas que já têm os campos")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,37 @@
+"""
+Latência do bcrypt em cada custo nesta máquina.
+
+Uso:
+  python -m scripts.bcrypt_benchmark                      # custos 8..15
+  python -m scripts.bcrypt_benchmark --min 10 --max 13 --samples 5
+
+Mostra também o custo que calibrate_bcrypt() escolheria para o alvo
+configurado (BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS).
+"""
+
+import argparse
+
+from app.utils.security import (
+    BCRYPT_MAX_ROUNDS, BCRYPT_MIN_ROUNDS, BCRYPT_TARGET_MS, calibrate_bcrypt, measure_bcrypt,
+)
+
+
+def main(args) -> None:
+    print(f"{'custo':>5}  {'ms':>9}")
+    for rounds in range(args.min, args.max + 1):
+        elapsed = measure_bcrypt(rounds, samples=args.samples)
+        marker = "  <= alvo" if elapsed <= args.target else ""
+        print(f"{rounds:>5}  {elapsed:>9.1f}{marker}")
+
+    chosen = calibrate_bcrypt(args.target, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS)
+    print(f"\nCusto calibrado para {args.target:.0f} ms "
+          f"(limites {BCRYPT_MIN_ROUNDS}..{BCRYPT_MAX_ROUNDS}): {chosen}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min", type=int, default=8, help="menor custo medido")
+    parser.add_argument("--max", type=int, default=15, help="maior custo medido")
+    parser.add_argument("--samples", type=int, default=3, help="hashes por custo (vale o menor)")
+    parser.add_argument("--target", type=float, default=BCRYPT_TARGET_MS, help="alvo em ms")
+    main(parser.parse_args())
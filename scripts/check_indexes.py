@@ -0,0 +1,48 @@
+"""
+Verifica os índices do MongoDB contra o registro em app/utils/indexes.py.
+
+Uso:
+  python -m scripts.check_indexes            # drift + explain das consultas
+  python -m scripts.check_indexes --ensure   # cria os índices antes de verificar
+
+Sai com código 1 se faltar algum índice registrado ou se alguma consulta
+canônica de rota cair em COLLSCAN.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.database import DatabaseManager
+from app.utils.indexes import ensure_indexes, explain_canonical_queries, index_drift
+
+
+async def main(args) -> int:
+    db = (await DatabaseManager.get_instance()).db
+    if args.ensure:
+        await ensure_indexes(db)
+
+    failed = False
+
+    drift = await index_drift(db)
+    for collection_name, report in drift.items():
+        for kind, names in report.items():
+            for name in names:
+                print(f"{'❌' if kind != 'extra' else '⚠️ '} {collection_name}.{name}: {kind}")
+        if report["missing"] or report["changed"]:
+            failed = True
+    if not drift:
+        print("✅ Índices em dia com o registro")
+
+    for route, stages in (await explain_canonical_queries(db)).items():
+        collscan = "COLLSCAN" in stages
+        failed = failed or collscan
+        print(f"{'❌' if collscan else '✅'} {route}: {' <- '.join(stages)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ensure", action="store_true", help="cria os índices antes")
+    sys.exit(asyncio.run(main(parser.parse_args())))
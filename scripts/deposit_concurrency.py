@@ -0,0 +1,99 @@
+"""
+Teste de concorrência dos aportes contra um MongoDB real (MONGO_URL).
+
+Cria um usuário e um projeto temporários, dispara N aportes em paralelo por
+apply_deposit e confere que nenhum valor se perdeu:
+  - applied_value do projeto == soma dos aportes
+  - transactions_count e buckets (count/sum) batem com N e com a soma
+  - total_invested do usuário == soma dos aportes
+  - cada DepositResponse viu um valor anterior distinto (sem leitura suja)
+
+Uso:
+  python -m scripts.deposit_concurrency --deposits 500
+
+Sai com código 1 se alguma verificação falhar. Os documentos são removidos ao final.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime
+
+from app.database import (
+    get_projects_collection, get_project_transactions_collection,
+    get_user_stats_collection, get_users_collection,
+)
+from app.utils.deposits import apply_deposit
+
+
+async def main(args) -> int:
+    users_collection    = await get_users_collection()
+    projects_collection = await get_projects_collection()
+    buckets_collection  = await get_project_transactions_collection()
+    stats_collection    = await get_user_stats_collection()
+
+    now = datetime.utcnow()
+    user = await users_collection.insert_one({
+        "name": "deposit-concurrency", "email": f"concurrency-{now.timestamp()}@example.invalid",
+        "hashed_password": "", "created_at": now, "updated_at": now, "total_invested": 0.0,
+    })
+    user_id = str(user.inserted_id)
+    project = await projects_collection.insert_one({
+        "title": "concurrency", "description": "", "category": "Teste",
+        "required_value": 1_000_000.0, "applied_value": 0.0, "start_date": now,
+        "user_id": user_id, "created_at": now, "updated_at": now, "progress": 0.0,
+        "transactions": [], "transactions_count": 0,
+    })
+    project_id = project.inserted_id
+
+    cents   = [random.randint(1, 100_00) for _ in range(args.deposits)]
+    amounts = [c / 100 for c in cents]
+    expected = sum(cents) / 100
+
+    failures = []
+    try:
+        started = asyncio.get_running_loop().time()
+        responses = await asyncio.gather(*(
+            apply_deposit(user_id, project_id, amount, f"#{i}")
+            for i, amount in enumerate(amounts)
+        ))
+        elapsed = asyncio.get_running_loop().time() - started
+        print(f"{len(responses)} aportes em {elapsed:.2f}s")
+
+        stored = await projects_collection.find_one({"_id": project_id})
+        if round(stored["applied_value"], 2) != round(expected, 2):
+            failures.append(f"applied_value={stored['applied_value']} esperado={expected:.2f}")
+        if stored["transactions_count"] != args.deposits:
+            failures.append(f"transactions_count={stored['transactions_count']} esperado={args.deposits}")
+
+        buckets = await buckets_collection.find({"project_id": str(project_id)}).to_list(None)
+        bucket_count = sum(b["count"] for b in buckets)
+        bucket_sum   = sum(b["sum"] for b in buckets)
+        if bucket_count != args.deposits or round(bucket_sum, 2) != round(expected, 2):
+            failures.append(f"buckets count={bucket_count} sum={bucket_sum:.2f}")
+
+        stored_user = await users_collection.find_one({"_id": user.inserted_id})
+        if round(stored_user["total_invested"], 2) != round(expected, 2):
+            failures.append(f"total_invested={stored_user['total_invested']} esperado={expected:.2f}")
+
+        previous = [round(r.previous_value, 2) for r in responses]
+        if len(set(previous)) != len(previous):
+            failures.append("dois aportes viram o mesmo valor anterior")
+    finally:
+        await projects_collection.delete_one({"_id": project_id})
+        await buckets_collection.delete_many({"project_id": str(project_id)})
+        await users_collection.delete_one({"_id": user.inserted_id})
+        await stats_collection.delete_one({"_id": user_id})
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Nenhum aporte perdido")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--deposits", type=int, default=300)
+    sys.exit(asyncio.run(main(parser.parse_args())))
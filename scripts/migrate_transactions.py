@@ -0,0 +1,23 @@
+"""
+Migração online: move o histórico embutido em projects.transactions para a
+coleção project_transactions (buckets mensais).
+
+Uso:
+  python -m scripts.migrate_transactions
+
+Pode rodar com a API no ar: cada projeto é migrado de forma idempotente e
+aportes/leituras de projetos ainda não migrados migram o projeto na hora.
+"""
+
+import asyncio
+
+from app.utils.transactions_store import migrate_all
+
+
+async def main() -> None:
+    migrated = await migrate_all()
+    print(f"{migrated} projeto(s) migrado(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Reconstrói a coleção user_stats a partir de projetos e anotações.
+
+Uso:
+  python -m scripts.rebuild_user_stats                 # todos os usuários
+  python -m scripts.rebuild_user_stats --user <id>     # um usuário
+  python -m scripts.rebuild_user_stats --check         # só reporta drift
+
+Com --check nada é gravado e o código de saída é 1 se houver drift.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.database import get_users_collection
+from app.utils.user_stats import check_drift, rebuild
+
+
+async def _user_ids(only: str = None):
+    if only:
+        return [only]
+    users_collection = await get_users_collection()
+    return [str(u["_id"]) async for u in users_collection.find({}, {"_id": 1})]
+
+
+async def main(args) -> int:
+    drifted = 0
+    for user_id in await _user_ids(args.user):
+        problems = await check_drift(user_id)
+        if problems:
+            drifted += 1
+            print(f"⚠️  {user_id}")
+            for problem in problems:
+                print(f"    {problem}")
+        if not args.check:
+            await rebuild(user_id)
+
+    print(f"{drifted} usuário(s) com drift")
+    return 1 if args.check and drifted else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user", help="ID de um único usuário")
+    parser.add_argument("--check", action="store_true", help="só verifica, não grava")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,101 @@
+"""
+Custo de serialização das listagens: caminho Pydantic x caminho rápido.
+
+  pydantic   ProjectDB(**doc) por item + validação do response_model pelo
+             FastAPI + jsonable_encoder + json.dumps (como era)
+  rápido     fast_json.to_public + FastJSONResponse (orjson, se instalado)
+
+Documentos sintéticos no formato do MongoDB (ObjectId, datetime). Confere
+também que os dois caminhos geram o mesmo JSON.
+
+Uso:
+  python -m scripts.serialization_benchmark --sizes 1000 10000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.project import ProjectDB
+from app.utils.fast_json import FastJSONResponse, orjson, to_public
+
+
+def _documents(n: int) -> List[dict]:
+    now = datetime(2024, 1, 1, 12, 0, 0, 123000)
+    user_id = str(ObjectId())
+    docs = []
+    for i in range(n):
+        docs.append({
+            "_id":            ObjectId(),
+            "title":          f"Projeto {i}",
+            "description":    "Reserva para manutenção do carro",
+            "category":       "Manutenção",
+            "required_value": 5000.0,
+            "applied_value":  float(i % 500),
+            "start_date":     now,
+            "user_id":        user_id,
+            "created_at":     now + timedelta(seconds=i),
+            "updated_at":     now + timedelta(seconds=i),
+            "progress":       round((i % 500) / 50, 2),
+            "transactions":   [
+                {"id": str(ObjectId()), "amount": 10.0, "note": "", "created_at": now}
+                for _ in range(5)
+            ],
+            "transactions_count": 5,
+        })
+    return docs
+
+
+async def _pydantic_path(docs: List[dict], field) -> bytes:
+    models = []
+    for doc in docs:
+        doc = dict(doc, id=str(doc["_id"]))
+        models.append(ProjectDB(**doc))
+    content = await serialize_response(field=field, response_content=models)
+    return JSONResponse(content).body
+
+
+def _fast_path(docs: List[dict]) -> bytes:
+    return FastJSONResponse([to_public(doc, ProjectDB) for doc in docs]).body
+
+
+def _best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(args) -> None:
+    field = create_response_field(name="Response", type_=List[ProjectDB])
+    loop = asyncio.new_event_loop()
+    print(f"encoder: {'orjson' if orjson else 'json (orjson não instalado)'}")
+    print(f"{'itens':>7}  {'pydantic ms':>12}  {'rápido ms':>10}  {'ganho':>6}")
+
+    for size in args.sizes:
+        docs = _documents(size)
+        slow = loop.run_until_complete(_pydantic_path(docs, field))
+        fast = _fast_path(docs)
+        if json.loads(slow) != json.loads(fast):
+            raise SystemExit("❌ Os dois caminhos geraram JSON diferente")
+
+        slow_ms = _best_of(args.repeat, lambda: loop.run_until_complete(_pydantic_path(docs, field)))
+        fast_ms = _best_of(args.repeat, lambda: _fast_path(docs))
+        print(f"{size:>7}  {slow_ms:>12.1f}  {fast_ms:>10.1f}  {slow_ms / fast_ms:>5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+"""
+Vazão do envio de e-mails: uma conexão por e-mail x pool de sessões.
+
+Sobe o servidor de scripts/smtp_stub_server.py em uma porta local e envia
+N mensagens das duas formas, imprimindo mensagens/s e conexões abertas.
+
+Uso:
+  python -m scripts.smtp_benchmark --messages 200 --latency 20 --pool-size 4
+"""
+
+import argparse
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.email_service import SMTPPool, _build_message
+from scripts.smtp_stub_server import StubSMTPServer
+
+_USER, _PASSWORD = "bench@example.invalid", "bench"
+
+
+def _one_connection_per_email(host: str, port: int, to_email: str, raw: str) -> None:
+    # Caminho antigo: conexão, EHLO e LOGIN para cada mensagem
+    with smtplib.SMTP(host, port, timeout=15) as smtp:
+        smtp.ehlo()
+        smtp.login(_USER, _PASSWORD)
+        smtp.sendmail(_USER, [to_email], raw)
+
+
+def main(args) -> None:
+    server = StubSMTPServer(port=args.port, latency_ms=args.latency)
+    server.start_in_thread()
+
+    emails = [f"user{i}@example.invalid" for i in range(args.messages)]
+    raw = {to: _build_message(to, "Benchmark", "<p>benchmark</p>") for to in emails}
+
+    # ── Uma conexão por e-mail (2 threads, como o executor original) ──────────
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(
+            lambda to: _one_connection_per_email("127.0.0.1", args.port, to, raw[to]), emails
+        ))
+    elapsed = time.perf_counter() - started
+    print(f"conexão por e-mail : {args.messages / elapsed:8.1f} msg/s "
+          f"({server.connections} conexões)")
+
+    # ── Pool de sessões, vários e-mails por sessão ────────────────────────────
+    server.connections = 0
+    pool = SMTPPool("127.0.0.1", args.port, _USER, _PASSWORD,
+                    starttls=False, size=args.pool_size)
+    chunks = [emails[i::args.pool_size] for i in range(args.pool_size)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.pool_size) as executor:
+        list(executor.map(
+            lambda chunk: pool.send_many((_USER, [to], raw[to]) for to in chunk), chunks
+        ))
+    elapsed = time.perf_counter() - started
+    pool.close()
+    print(f"pool ({args.pool_size} sessões)   : {args.messages / elapsed:8.1f} msg/s "
+          f"({pool.stats['connections']} conexões)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=20.0, help="atraso por resposta do servidor, em ms")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--port", type=int, default=2525)
+    main(parser.parse_args())
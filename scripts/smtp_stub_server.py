@@ -0,0 +1,109 @@
+"""
+Servidor SMTP local que aceita e descarta mensagens (substituto para testes).
+
+Fala o suficiente do protocolo para o smtplib: EHLO/HELO, AUTH PLAIN/LOGIN
+(aceita qualquer credencial), MAIL, RCPT, DATA, RSET, NOOP e QUIT. Sem TLS:
+use SMTP_STARTTLS=false ao apontar o app para ele.
+
+Uso:
+  python -m scripts.smtp_stub_server --port 2525 --latency 20
+
+--latency simula o round-trip de rede (ms) em cada resposta do servidor.
+"""
+
+import argparse
+import asyncio
+import threading
+from typing import Optional
+
+
+class StubSMTPServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 2525, latency_ms: float = 0.0):
+        self.host, self.port = host, port
+        self.latency = latency_ms / 1000
+        self.messages = 0
+        self.connections = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def _reply(self, writer: asyncio.StreamWriter, line: str) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write((line + "\r\n").encode())
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await self._reply(writer, "220 stub ESMTP")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb == "EHLO":
+                    writer.write(b"250-stub\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n")
+                    await self._reply(writer, "250 SIZE 10485760")
+                elif verb == "HELO":
+                    await self._reply(writer, "250 stub")
+                elif verb == "AUTH":
+                    parts = command.split()
+                    if len(parts) > 1 and parts[1].upper() == "LOGIN":
+                        if len(parts) == 2:    # usuário não veio junto do comando
+                            await self._reply(writer, "334 VXNlcm5hbWU6")
+                            await reader.readline()
+                        await self._reply(writer, "334 UGFzc3dvcmQ6")
+                        await reader.readline()
+                    elif len(parts) < 3:
+                        await self._reply(writer, "334 ")
+                        await reader.readline()
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await self._reply(writer, "250 OK")
+                elif verb == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.messages += 1
+                    await self._reply(writer, "250 OK queued")
+                elif verb == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    break
+                else:
+                    await self._reply(writer, "502 Command not implemented")
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> threading.Thread:
+        """Roda o servidor num event loop próprio (para benchmarks síncronos)."""
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait()
+        return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso por resposta, em ms")
+    args = parser.parse_args()
+    print(f"SMTP stub em {args.host}:{args.port}")
+    asyncio.run(StubSMTPServer(args.host, args.port, args.latency).serve_forever())